@@ -1,100 +1,337 @@
 import csv
+import json
 import requests
 import os
 import sys
+import time
+import argparse
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def assign_courses_to_groups(instance_url, token, input_courses_file, input_groups_file, output_dir):
+# The shared API client lives in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lp_api_client import LPClient
+from lp_mirror import Mirror, course_id_of
+import lp_metrics
+
+def courses_payload(course_ids):
+    # JSON body assigning the given courses to a group
+    return json.dumps([{"CourseId": int(course_id), "Priority": "Default"} for course_id in course_ids]).encode("utf-8")
+
+def build_course_index(courses_reader):
+    """Map each (grade, language) to its course count, the JSON body assigning those courses and their IDs."""
+    courses_by_key = defaultdict(list)
+    for row in courses_reader:
+        courses_by_key[(row["Grade"], row["Language"])].append(str(int(row["Course ID"])))
+    return {
+        key: (len(course_ids), courses_payload(course_ids), tuple(course_ids))
+        for key, course_ids in courses_by_key.items()
+    }
+
+def plan_course_assignments(input_courses_file, input_groups_file):
+    # Count groups per (grade, language) without calling the API
+    with open(input_courses_file, mode="r", encoding="utf-8") as courses_file, \
+         open(input_groups_file, mode="r", encoding="utf-8") as groups_file:
+        course_index = build_course_index(csv.DictReader(courses_file))
+        group_counts = Counter((row["Grade"], row["Language"]) for row in csv.DictReader(groups_file))
+
+    print(f"{'Grade':<8} {'Language':<9} {'Groups':>10} {'Courses':>8}")
+    total_requests = 0
+    total_assignments = 0
+    for key in sorted(set(group_counts) | set(course_index)):
+        grade, language = key
+        groups = group_counts.get(key, 0)
+        courses = course_index[key][0] if key in course_index else 0
+        if courses:
+            total_requests += groups
+            total_assignments += groups * courses
+        print(f"{grade:<8} {language:<9} {groups:>10} {courses:>8}")
+
+    print(f"Groups to update: {total_requests}, course assignments: {total_assignments}, "
+          f"groups without matching courses: {sum(group_counts.values()) - total_requests}")
+
+class CompletionJournal:
+    """Append-only log of group IDs whose courses were assigned, fsynced every `batch_size` entries."""
+
+    def __init__(self, path, resume=False, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.unsynced = 0
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, mode="r", encoding="utf-8") as file:
+                self.done = {line.strip() for line in file if line.strip()}
+        self.file = open(path, mode="a" if resume else "w", encoding="utf-8")
+
+    def record(self, group_id):
+        self.file.write(f"{group_id}\n")
+        self.done.add(group_id)
+        self.unsynced += 1
+        if self.unsynced >= self.batch_size:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+def post_courses(client, api_path, payload):
+    """POST one group's courses and return (result, retryable)."""
+    try:
+        response = client.post(api_path, data=payload, headers={"Content-Type": "application/json"})
+    except requests.exceptions.RequestException as e:
+        return f"Fail ({e})", True
+
+    # Determine the result of the API call
+    if response.status_code in [200, 204]:
+        return "Success", False
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return f"Fail ({response.status_code}: {response.text})", retryable
+
+def sync_courses(client, api_path, course_ids, current=None):
+    """Fetch one group's courses (unless `current` is known), POST only the missing ones and return
+    (result, retryable, changes)."""
+    changes = {"added": [], "present": 0, "extraneous": [], "current": None}
+    if current is None:
+        try:
+            response = client.get(api_path)
+        except requests.exceptions.RequestException as e:
+            return f"Fail ({e})", True, changes
+        if response.status_code != 200:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            return f"Fail ({response.status_code}: {response.text})", retryable, changes
+        current = {course_id_of(item) for item in response.json()}
+        changes["current"] = current
+
+    # Diff the group's courses against the plan; extraneous courses are reported, not removed
+    wanted = set(course_ids)
+    missing = [course_id for course_id in course_ids if course_id not in current]
+    changes["present"] = len(wanted) - len(missing)
+    changes["extraneous"] = sorted(current - wanted, key=int)
+    if not missing:
+        return "Up to date", False, changes
+
+    result, retryable = post_courses(client, api_path, courses_payload(missing))
+    if result == "Success":
+        changes["added"] = missing
+    return result, retryable, changes
+
+def assign_courses_to_groups(instance_url, token, input_courses_file, input_groups_file, output_dir,
+                             workers=1, rate_limit=0, journal_file=None, resume=False,
+                             max_retries=5, retry_delay=2.0, mirror_path=None, sync=False, groups=None):
+    """Assign courses to the groups in input_groups_file, or to the `groups` rows (dicts with Group ID,
+    Group Name, Grade and Language) when given, e.g. straight from lebanon_pipeline.py."""
     # Construct the output file name
     current_time = datetime.now().strftime("%d-%m-%Y__%H-%M-%S")
     output_file = os.path.join(output_dir, f"course_assignments_{current_time}.csv")
 
-    # Base URL for assigning courses to groups
-    api_url_template = f"{instance_url}/api/v1/Groups/{{groupId}}/Courses"
+    # The journal is tied to the groups file so that --resume finds it again
+    if journal_file is None:
+        groups_name = os.path.splitext(os.path.basename(input_groups_file or "pipeline"))[0]
+        journal_file = os.path.join(output_dir, f"course_assignments_{groups_name}.journal")
 
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    # Path for assigning courses to groups
+    api_path_template = "/api/v1/Groups/{groupId}/Courses"
+
+    # One keep-alive client shared by all workers, with a connection per worker
+    # The retry rounds below are the only retries, so --max-retries 0 sends each request once
+    client = LPClient(instance_url, token, retries=0, pool_size=workers, rate_limit=rate_limit)
+    journal = CompletionJournal(journal_file, resume=resume)
+    # Successful assignments are written through to the local mirror, if any
+    mirror = Mirror(mirror_path) if mirror_path else None
+    failed_groups = []
+    skipped = 0
+    sync_totals = Counter()
+    groups_file = None
 
     try:
         # Open input files and output file
         with open(input_courses_file, mode="r", encoding="utf-8") as courses_file, \
-             open(input_groups_file, mode="r", encoding="utf-8") as groups_file, \
-             open(output_file, mode="w", newline="", encoding="utf-8") as outfile:
+             open(output_file, mode="w", newline="", encoding="utf-8") as outfile, \
+             ThreadPoolExecutor(max_workers=workers) as executor:
 
             courses_reader = csv.DictReader(courses_file)
-            groups_reader = csv.DictReader(groups_file)
+            if groups is None:
+                groups_file = open(input_groups_file, mode="r", encoding="utf-8")
+                groups_reader = csv.DictReader(groups_file)
+            else:
+                groups_reader = groups
             writer = csv.writer(outfile)
 
             # Write the header for the output file
-            writer.writerow(["Group ID", "Group Name", "Courses Assigned", "Result"])
-
-            # Create a list of groups for quick matching
-            groups = [
-                {"Group ID": row["Group ID"], "Group Name": row["Group Name"],
-                 "Grade": row["Grade"], "Language": row["Language"]}
-                for row in groups_reader
-            ]
-
-            # Organize courses by grade and language
-            courses = [
-                {"Course ID": row["Course ID"], "Grade": row["Grade"], "Language": row["Language"]}
-                for row in courses_reader
-            ]
-
-            # Match courses to groups and prepare API payloads
-            for group in groups:
-                group_id = group["Group ID"]
-                group_name = group["Group Name"]
-                grade = group["Grade"]
-                language = group["Language"]
-
-                # Find courses matching the group's grade and language
-                matching_courses = [
-                    {"CourseId": int(course["Course ID"]), "Priority": "Default"}
-                    for course in courses
-                    if course["Grade"] == grade and course["Language"] == language
-                ]
-
-                # Skip if no matching courses
-                if not matching_courses:
-                    continue
-
-                # Construct the API URL for the group
-                api_url = api_url_template.format(groupId=group_id)
-
-                # Make the POST request with all matching courses
-                response = requests.post(api_url, json=matching_courses, headers=headers)
-
-                # Determine the result of the API call
-                if response.status_code in [200, 204]:
-                    result = "Success"
-                else:
-                    result = f"Fail ({response.status_code}: {response.text})"
-                    # Print and stop the script on failure
-                    print(f"API call failed for Group ID {group_id}: {result}")
-                    sys.exit(1)
-
-                # Write the result to the output file
-                writer.writerow([group_id, group_name, len(matching_courses), result])
-
-                # Print the result in CLI
-                print(f"Group ID: {group_id}, Group Name: {group_name}, Courses Assigned: {len(matching_courses)}, Result: {result}")
+            if sync:
+                writer.writerow(["Group ID", "Group Name", "Courses Added", "Already Present", "Extraneous Courses", "Result"])
+            else:
+                writer.writerow(["Group ID", "Group Name", "Courses Assigned", "Result"])
 
+            # Organize courses by grade and language, built once for all groups
+            with lp_metrics.metrics.stage("read_courses"):
+                course_index = build_course_index(courses_reader)
+
+            def send(items, final_attempt):
+                """POST each item with a bounded window in flight and return the ones to retry."""
+                retry_queue = []
+                # Requests in flight, oldest first, so rows are written in input order
+                pending = deque()
+
+                def finish_oldest():
+                    item, future = pending.popleft()
+                    group_id, group_name, course_count, _, course_ids, _ = item
+                    # Time spent waiting on the API, as opposed to reading, matching and writing
+                    with lp_metrics.metrics.stage("wait_for_api"):
+                        if sync:
+                            result, retryable, changes = future.result()
+                        else:
+                            result, retryable = future.result()
+                    if retryable and not final_attempt:
+                        print(f"API call failed for Group ID {group_id}, queued for retry: {result}")
+                        retry_queue.append(item)
+                        return
+
+                    # Write the result to the output file
+                    if sync:
+                        course_count = len(changes["added"])
+                        writer.writerow([group_id, group_name, course_count, changes["present"],
+                                         " ".join(changes["extraneous"]), result])
+                        sync_totals.update(added=course_count, present=changes["present"],
+                                           extraneous=len(changes["extraneous"]))
+                        if mirror and changes["current"] is not None:
+                            mirror.replace_assignments(instance_url, group_id, changes["current"], group_name)
+                    else:
+                        writer.writerow([group_id, group_name, course_count, result])
+                    if result in ("Success", "Up to date"):
+                        journal.record(group_id)
+                        if mirror:
+                            mirror.record_assignments(instance_url, group_id,
+                                                      changes["added"] if sync else course_ids)
+                    else:
+                        failed_groups.append(group_id)
+
+                    # Print the result in CLI
+                    print(f"Group ID: {group_id}, Group Name: {group_name}, Courses Assigned: {course_count}, Result: {result}")
+
+                for item in items:
+                    api_path = api_path_template.format(groupId=item[0])
+                    if sync:
+                        future = executor.submit(sync_courses, client, api_path, item[4], item[5])
+                    else:
+                        future = executor.submit(post_courses, client, api_path, item[3])
+                    pending.append((item, future))
+
+                    # Keep a bounded window of requests in flight
+                    if len(pending) >= workers * 4:
+                        finish_oldest()
+
+                while pending:
+                    finish_oldest()
+                return retry_queue
+
+            def matched_groups():
+                # Match groups to courses as they are read and yield the prebuilt payloads
+                nonlocal skipped
+                for row in groups_reader:
+                    group_id = row["Group ID"]
+
+                    # Skip groups completed by a previous run
+                    if group_id in journal.done:
+                        skipped += 1
+                        continue
+
+                    # Skip if no matching courses
+                    entry = course_index.get((row["Grade"], row["Language"]))
+                    if entry is None:
+                        continue
+                    course_count, payload, course_ids = entry
+
+                    # In sync mode, groups whose assignments are in the mirror aren't fetched again
+                    current = mirror.known_group_courses(instance_url, group_id) if sync and mirror else None
+                    yield group_id, row["Group Name"], course_count, payload, course_ids, current
+
+            with lp_metrics.metrics.stage("assign"):
+                retry_queue = send(matched_groups(), final_attempt=max_retries == 0)
+
+            # Retry transient failures with exponential backoff instead of aborting the run
+            for attempt in range(1, max_retries + 1):
+                if not retry_queue:
+                    break
+                delay = retry_delay * 2 ** (attempt - 1)
+                print(f"Retrying {len(retry_queue)} groups in {delay:.0f} seconds (attempt {attempt}/{max_retries})...")
+                with lp_metrics.metrics.stage("retry_backoff"):
+                    time.sleep(delay)
+                with lp_metrics.metrics.stage("assign"):
+                    retry_queue = send(retry_queue, final_attempt=attempt == max_retries)
+
+            if skipped:
+                print(f"Skipped {skipped} groups already completed according to {journal_file}")
+            if sync:
+                print(f"Sync: {sync_totals['added']} assignments added, {sync_totals['present']} already present, "
+                      f"{sync_totals['extraneous']} extraneous (not removed)")
             print(f"Course assignments saved successfully to {output_file}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        if groups_file:
+            groups_file.close()
+        journal.close()
+        client.close()
+        if mirror:
+            mirror.close()
+
+    if failed_groups:
+        print(f"Course assignment failed for {len(failed_groups)} groups: {', '.join(failed_groups)}")
+        print(f"Rerun with --resume to retry only the groups that are not in {journal_file}")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 6:
-        print("Usage: python script.py <INSTANCE_URL> <INPUT_COURSES_FILE> <INPUT_GROUPS_FILE> <OUTPUT_DIRECTORY> <TOKEN>")
-    else:
-        instance_url = sys.argv[1]
-        input_courses_file = sys.argv[2]
-        input_groups_file = sys.argv[3]
-        output_dir = sys.argv[4]
-        token = sys.argv[5]
-        assign_courses_to_groups(instance_url, token, input_courses_file, input_groups_file, output_dir)
+    parser = argparse.ArgumentParser(description="Assign courses to groups based on matching grade and language.")
+    parser.add_argument("instance_url", help="Base URL of the Learning Passport instance")
+    parser.add_argument("input_courses_file", help="CSV file with Course ID, Grade and Language columns")
+    parser.add_argument("input_groups_file", help="CSV file with filtered groups")
+    parser.add_argument("output_dir", help="Directory where the result CSV will be saved")
+    parser.add_argument("token", help="API access token")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent requests (default: 1)")
+    parser.add_argument("--plan-only", action="store_true",
+                        help="Print how many groups and courses fall under each grade/language and exit")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="Maximum requests per second across all workers (default: unlimited)")
+    parser.add_argument("--journal", default=None,
+                        help="Journal of completed group IDs (default: course_assignments_<groups file>.journal "
+                             "in the output directory)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip groups already recorded in the journal by a previous run")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retry rounds for groups that failed with 429, 5xx or a connection error (default: 5)")
+    parser.add_argument("--retry-delay", type=float, default=2.0,
+                        help="Delay in seconds before the first retry round, doubled each round (default: 2)")
+    parser.add_argument("--mirror", metavar="DB",
+                        help="Record successful assignments in this local mirror (see lp_mirror.py); with --sync, "
+                             "also read the current assignments of groups from it")
+    parser.add_argument("--sync", action="store_true",
+                        help="Fetch each group's current courses and only POST the missing ones")
+    lp_metrics.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.plan_only:
+        plan_course_assignments(args.input_courses_file, args.input_groups_file)
+        sys.exit(0)
+
+    lp_metrics.enable_from_args(args)
+    try:
+        assign_courses_to_groups(args.instance_url, args.token, args.input_courses_file, args.input_groups_file,
+                                 args.output_dir, workers=args.workers, rate_limit=args.rate_limit,
+                                 journal_file=args.journal, resume=args.resume,
+                                 max_retries=args.max_retries, retry_delay=args.retry_delay,
+                                 mirror_path=args.mirror, sync=args.sync)
+    finally:
+        lp_metrics.write_reports(args)
@@ -1,47 +1,156 @@
 import csv
-import re
+import io
 import os
-import sys
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-def extract_groups_by_naming_convention(input_file, output_dir):
-    # Define valid grade and language values
-    valid_grades = ["KG1", "KG2", "KG3", "G1", "G2", "G3", "G4", "G5", "G6", "G7", "G8", "G9",
-                    "G10", "G11H", "G11SC", "G12SG", "G12LH", "G12SV", "G12SE"]
-    valid_languages = ["EN", "FR", "AR"]
+# Define valid grade and language values
+VALID_GRADES = ["KG1", "KG2", "KG3", "G1", "G2", "G3", "G4", "G5", "G6", "G7", "G8", "G9",
+                "G10", "G11H", "G11SC", "G12SG", "G12LH", "G12SV", "G12SE"]
+VALID_LANGUAGES = ["EN", "FR", "AR"]
+GRADE_SET = frozenset(VALID_GRADES)
+LANGUAGE_SET = frozenset(VALID_LANGUAGES)
 
-    # Construct the output file name
+# Bytes of input classified per worker task
+CHUNK_SIZE = 8 * 1024 * 1024
+
+def classify_group_name(group_name):
+    # Match the SchoolID-Grade-Language-* naming convention; return (grade, language) or None
+    parts = group_name.split("-", 3)
+    if len(parts) == 4 and parts[0].isdecimal() and parts[1] in GRADE_SET and parts[2] in LANGUAGE_SET:
+        return parts[1], parts[2]
+    return None
+
+def count_quotes(infile, length):
+    # Number of quote characters in the next `length` bytes of infile
+    quotes = 0
+    while length > 0:
+        block = infile.read(min(length, 1024 * 1024))
+        if not block:
+            break
+        quotes += block.count(b'"')
+        length -= len(block)
+    return quotes
+
+def find_chunk_boundaries(input_file, data_start, chunk_size):
+    # Split the file into byte ranges that each end at a record boundary: a line break outside quotes.
+    # Quoted fields may contain line breaks, and quotes inside them are doubled, so a line break
+    # ends a record only when an even number of quotes precedes it.
+    file_size = os.path.getsize(input_file)
+    boundaries = [data_start]
+    position = data_start
+    quotes = 0
+    with open(input_file, mode="rb") as infile:
+        infile.seek(data_start)
+        while boundaries[-1] + chunk_size < file_size:
+            target = boundaries[-1] + chunk_size
+            quotes += count_quotes(infile, target - position)
+            position = target
+            while line := infile.readline():
+                position += len(line)
+                quotes += line.count(b'"')
+                if quotes % 2 == 0 and line.endswith(b"\n"):
+                    break
+            if position >= file_size:
+                break
+            boundaries.append(position)
+    boundaries.append(file_size)
+    return list(zip(boundaries, boundaries[1:]))
+
+def classify_chunk(input_file, start, end, id_column, name_column):
+    # Classify the records in one byte range; runs in a worker process
+    with open(input_file, mode="rb") as infile:
+        infile.seek(start)
+        text = infile.read(end - start).decode("utf-8")
+
+    matched = []
+    rejected = []
+    counts = Counter()
+    for row in csv.reader(io.StringIO(text, newline="")):
+        if not row:
+            continue
+        group_id, group_name = row[id_column], row[name_column]
+        match = classify_group_name(group_name)
+        if match:
+            grade, language = match
+            matched.append([group_id, group_name, grade, language])
+            counts[match] += 1
+        else:
+            rejected.append([group_id, group_name])
+    return matched, rejected, counts
+
+def extract_groups_by_naming_convention(input_file, output_dir, workers=1):
+    # Construct the output file names
     current_time = datetime.now().strftime("%d-%m-%Y__%H-%M-%S")
     output_file = os.path.join(output_dir, f"filtered_groups_{current_time}.csv")
+    counts_file = os.path.join(output_dir, f"filtered_groups_{current_time}_counts.csv")
+    rejected_file = os.path.join(output_dir, f"filtered_groups_{current_time}_rejected.csv")
 
-    # Regex pattern to match naming convention
-    naming_pattern = re.compile(r"^(\d+)-(" + "|".join(valid_grades) + ")-(" + "|".join(valid_languages) + r")-.*$")
-
+    executor = None
     try:
-        with open(input_file, mode="r", encoding="utf-8") as infile, open(output_file, mode="w", newline="", encoding="utf-8") as outfile:
-            reader = csv.DictReader(infile)
+        # Read the header to locate the columns and where the records start
+        with open(input_file, mode="rb") as infile:
+            header = next(csv.reader([infile.readline().decode("utf-8-sig")]))
+            data_start = infile.tell()
+        id_column = header.index("Group ID")
+        name_column = header.index("Group Name")
+
+        # Classify byte ranges in parallel; results come back in the original order
+        chunks = find_chunk_boundaries(input_file, data_start, CHUNK_SIZE)
+        arguments = ([input_file] * len(chunks), [start for start, _ in chunks], [end for _, end in chunks],
+                     [id_column] * len(chunks), [name_column] * len(chunks))
+        if workers > 1 and len(chunks) > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(classify_chunk, *arguments)
+        else:
+            results = map(classify_chunk, *arguments)
+
+        counts = Counter()
+        with open(output_file, mode="w", newline="", encoding="utf-8") as outfile, \
+             open(rejected_file, mode="w", newline="", encoding="utf-8") as rejectfile:
             writer = csv.writer(outfile)
+            rejected_writer = csv.writer(rejectfile)
 
-            # Write the header for the output file
+            # Write the header for the output files
             writer.writerow(["Group ID", "Group Name", "Grade", "Language"])
+            rejected_writer.writerow(["Group ID", "Group Name"])
 
-            # Process each group in the input file
-            for row in reader:
-                group_name = row["Group Name"]
-                match = naming_pattern.match(group_name)
-                if match:
-                    school_id, grade, language = match.groups()
-                    writer.writerow([row["Group ID"], group_name, grade, language])
+            # Process each chunk of groups as it is classified
+            for matched, rejected, chunk_counts in results:
+                writer.writerows(matched)
+                rejected_writer.writerows(rejected)
+                counts.update(chunk_counts)
 
-            print(f"Filtered groups saved successfully to {output_file}")
+        # Write the number of groups per grade and language
+        with open(counts_file, mode="w", newline="", encoding="utf-8") as countfile:
+            writer = csv.writer(countfile)
+            writer.writerow(["Grade", "Language", "Groups"])
+            for grade in VALID_GRADES:
+                for language in VALID_LANGUAGES:
+                    if counts[(grade, language)]:
+                        writer.writerow([grade, language, counts[(grade, language)]])
+
+        print(f"Filtered groups saved successfully to {output_file}")
+        print(f"{sum(counts.values())} groups matched; counts saved to {counts_file}")
+        print(f"Groups not matching the naming convention saved to {rejected_file}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if executor:
+            executor.shutdown()
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python script.py <INPUT_FILE> <OUTPUT_DIRECTORY>")
-    else:
-        input_file = sys.argv[1]
-        output_dir = sys.argv[2]
-        extract_groups_by_naming_convention(input_file, output_dir)
+    parser = argparse.ArgumentParser(description="Filter groups that follow the SchoolID-Grade-Language-* naming convention.")
+    parser.add_argument("input_file", help="CSV file with Group ID and Group Name columns")
+    parser.add_argument("output_dir", help="Directory where the filtered CSV files will be saved")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    extract_groups_by_naming_convention(args.input_file, args.output_dir, workers=args.workers)
@@ -0,0 +1,129 @@
+import csv
+import os
+import sys
+import argparse
+from collections import Counter
+from datetime import datetime
+
+# The shared API client and retrieve_all_groups.py live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lp_api_client import LPClient
+from lp_json_stream import iter_json_array
+from retrieve_all_groups import groups_output_file, CHUNK_SIZE
+from lebanon_extract_groups import classify_group_name, VALID_GRADES, VALID_LANGUAGES
+from lebanon_assign_courses_to_groups import assign_courses_to_groups
+import lp_metrics
+
+# Retrieve -> extract -> assign in one process. Each stage is a generator pulling from the one
+# before it, so groups are classified and queued for assignment while the Groups response is
+# still downloading, and the intermediate CSV files are only written when asked for.
+
+def retrieve_stage(instance_url, token, output_dir=None):
+    """Yield (group ID, group name) as the Groups response arrives, optionally saving them to CSV."""
+    with LPClient(instance_url, token) as client:
+        response = client.get("/api/v1/Groups", stream=True)
+        response.raise_for_status()
+        groups = iter_json_array(response.iter_content(chunk_size=CHUNK_SIZE))
+
+        if output_dir is None:
+            for group in groups:
+                yield str(group.get("GroupId")), group.get("GroupName") or ""
+            return
+
+        output_file = groups_output_file(instance_url, output_dir)
+        with open(output_file, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Group ID", "Group Name"])
+            for group in groups:
+                row = [str(group.get("GroupId")), group.get("GroupName") or ""]
+                writer.writerow(row)
+                yield row
+        print(f"Groups saved successfully to {output_file}")
+
+def classify_stage(groups, output_dir=None):
+    """Yield the groups matching the naming convention as rows for assign_courses_to_groups."""
+    counts = Counter()
+    rejected_count = 0
+    writers = None
+    files = []
+    if output_dir is not None:
+        # Same files as lebanon_extract_groups.py
+        current_time = datetime.now().strftime("%d-%m-%Y__%H-%M-%S")
+        output_file = os.path.join(output_dir, f"filtered_groups_{current_time}.csv")
+        counts_file = os.path.join(output_dir, f"filtered_groups_{current_time}_counts.csv")
+        rejected_file = os.path.join(output_dir, f"filtered_groups_{current_time}_rejected.csv")
+        files = [open(output_file, mode="w", newline="", encoding="utf-8"),
+                 open(rejected_file, mode="w", newline="", encoding="utf-8")]
+        writers = [csv.writer(file) for file in files]
+        writers[0].writerow(["Group ID", "Group Name", "Grade", "Language"])
+        writers[1].writerow(["Group ID", "Group Name"])
+
+    try:
+        for group_id, group_name in groups:
+            match = classify_group_name(group_name)
+            if match is None:
+                rejected_count += 1
+                if writers:
+                    writers[1].writerow([group_id, group_name])
+                continue
+            grade, language = match
+            counts[match] += 1
+            if writers:
+                writers[0].writerow([group_id, group_name, grade, language])
+            yield {"Group ID": group_id, "Group Name": group_name, "Grade": grade, "Language": language}
+    finally:
+        for file in files:
+            file.close()
+
+    print(f"{sum(counts.values())} groups matched the naming convention, {rejected_count} did not")
+    if output_dir is not None:
+        with open(counts_file, mode="w", newline="", encoding="utf-8") as countfile:
+            writer = csv.writer(countfile)
+            writer.writerow(["Grade", "Language", "Groups"])
+            for grade in VALID_GRADES:
+                for language in VALID_LANGUAGES:
+                    if counts[(grade, language)]:
+                        writer.writerow([grade, language, counts[(grade, language)]])
+        print(f"Filtered groups saved successfully to {output_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieve, filter and assign courses to groups in one streaming run.")
+    parser.add_argument("instance_url", help="Base URL of the Learning Passport instance")
+    parser.add_argument("input_courses_file", help="CSV file with Course ID, Grade and Language columns")
+    parser.add_argument("output_dir", help="Directory where the result CSV (and intermediate files) will be saved")
+    parser.add_argument("token", help="API access token")
+    parser.add_argument("--save-intermediate", action="store_true",
+                        help="Also write the all-groups and filtered-groups CSV files of the standalone scripts")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent assignment requests (default: 1)")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="Maximum requests per second across all workers (default: unlimited)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Fetch each group's current courses and only POST the missing ones")
+    parser.add_argument("--mirror", metavar="DB",
+                        help="Local mirror to record assignments in (and, with --sync, to read them from)")
+    parser.add_argument("--journal", default=None,
+                        help="Journal of completed group IDs (default: course_assignments_pipeline.journal "
+                             "in the output directory)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip groups already recorded in the journal by a previous run")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retry rounds for groups that failed with 429, 5xx or a connection error (default: 5)")
+    parser.add_argument("--retry-delay", type=float, default=2.0,
+                        help="Delay in seconds before the first retry round, doubled each round (default: 2)")
+    lp_metrics.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    intermediate_dir = args.output_dir if args.save_intermediate else None
+    groups = classify_stage(retrieve_stage(args.instance_url, args.token, intermediate_dir), intermediate_dir)
+    lp_metrics.enable_from_args(args)
+    try:
+        assign_courses_to_groups(args.instance_url, args.token, args.input_courses_file, None, args.output_dir,
+                                 workers=args.workers, rate_limit=args.rate_limit, journal_file=args.journal,
+                                 resume=args.resume, max_retries=args.max_retries, retry_delay=args.retry_delay,
+                                 mirror_path=args.mirror, sync=args.sync, groups=groups)
+    finally:
+        lp_metrics.write_reports(args)
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from urllib.request import urlopen, Request
+
+# Runs the API scripts against the local stub server at several dataset sizes and reports wall
+# time, requests/sec and peak RSS for each. Results are compared with a stored baseline and the
+# run fails when a script got slower, bigger or chattier than the tolerance allows.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lp_stub_server.py")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_baseline.json")
+TIME_SLACK = 0.1  # Seconds always allowed on top of the tolerance, for very short runs
+RSS_SLACK_MB = 5
+
+SCRIPTS = {
+    "fetch_courses": lambda url, work: [os.path.join(ROOT, "fetch_courses.py"), url, "token", work],
+    "retrieve_all_groups": lambda url, work: [os.path.join(ROOT, "retrieve_all_groups.py"), url, work, "token"],
+    "lp_count_groups": lambda url, work: [os.path.join(ROOT, "lp_count_groups.py"), url, "token"],
+    "assign_courses": lambda url, work: [
+        os.path.join(ROOT, "LP Lebanon Madristi", "lebanon_assign_courses_to_groups.py"), url,
+        os.path.join(work, "courses.csv"), os.path.join(work, "groups.csv"), work, "token", "--workers", "8"],
+}
+
+def start_server(work, group_count, args):
+    # The stub runs in its own process so its dataset doesn't count towards the scripts' peak RSS
+    server = subprocess.Popen(
+        [sys.executable, STUB_SERVER, "--port", "0", "--groups", str(group_count), "--courses", str(args.courses),
+         "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+         "--throttle-rate", str(args.throttle_rate), "--retry-after", "0", "--inputs-dir", work],
+        stdout=subprocess.PIPE, text=True)
+    url = server.stdout.readline().split()[-1]
+    return server, url
+
+def server_stats(url, reset=False):
+    request = Request(f"{url}/__reset", data=b"", method="POST") if reset else f"{url}/__stats"
+    with urlopen(request) as response:
+        return None if reset else json.load(response)
+
+def run_script(command):
+    """Run a script in a fresh process; returns (exit code, wall time, peak RSS in MB)."""
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, *command], stdout=subprocess.DEVNULL, stderr=stderr)
+        # wait4 returns the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code:
+            stderr.seek(0)
+            print(stderr.read().decode("utf-8", "replace"))
+    # ru_maxrss is in KB on Linux
+    return exit_code, elapsed, usage.ru_maxrss / 1024
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result["wall_s"] > base["wall_s"] * (1 + tolerance) + TIME_SLACK:
+            regressions.append(f"{key}: wall time {result['wall_s']:.2f}s vs baseline {base['wall_s']:.2f}s")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance) + RSS_SLACK_MB:
+            regressions.append(f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB vs baseline {base['peak_rss_mb']:.0f} MB")
+        if result["requests"] > base["requests"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['requests']} requests vs baseline {base['requests']}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Learning Passport API scripts against a local stub server.")
+    parser.add_argument("--groups", type=int, nargs="+", default=[1000, 20000],
+                        help="Dataset sizes (number of groups) to run (default: 1000 20000)")
+    parser.add_argument("--courses", type=int, default=200, help="Number of published courses (default: 200)")
+    parser.add_argument("--scripts", nargs="+", choices=sorted(SCRIPTS), default=sorted(SCRIPTS),
+                        help="Scripts to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stub request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of stub requests answered with 429")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline results to compare with (default: benchmarks/api_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results to --baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown or growth before failing (default: 0.25)")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    print(f"{'Script':<22} {'Groups':>8} {'Wall (s)':>9} {'Requests':>9} {'Req/s':>8} {'Peak RSS (MB)':>14}")
+    for group_count in args.groups:
+        with tempfile.TemporaryDirectory() as work:
+            server, url = start_server(work, group_count, args)
+            for name in args.scripts:
+                server_stats(url, reset=True)
+                exit_code, elapsed, peak_rss = run_script(SCRIPTS[name](url, work))
+                requests_made = server_stats(url)["requests"]
+                if exit_code:
+                    print(f"{name} failed with exit code {exit_code}")
+                    failed = True
+                    continue
+                results[f"{name}@{group_count}"] = {"wall_s": round(elapsed, 3), "requests": requests_made,
+                                                    "peak_rss_mb": round(peak_rss, 1)}
+                print(f"{name:<22} {group_count:>8} {elapsed:>9.2f} {requests_made:>9} "
+                      f"{requests_made / elapsed:>8.0f} {peak_rss:>14.1f}")
+            server.terminate()
+            server.wait()
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            failed = True
+        else:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,60 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+from urllib.request import urlopen, Request
+
+from lp_stub_server import start_stub_server, write_assignment_inputs
+
+# Load the assignment script from its folder (the folder name contains spaces)
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "..", "LP Lebanon Madristi", "lebanon_assign_courses_to_groups.py")
+spec = importlib.util.spec_from_file_location("lebanon_assign_courses_to_groups", SCRIPT_PATH)
+assign_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(assign_module)
+
+def stub_request(server, method, path):
+    with urlopen(Request(f"http://127.0.0.1:{server.server_address[1]}{path}", method=method)) as response:
+        body = response.read()
+    return json.loads(body) if body else None
+
+def run(instance_url, courses_file, groups_file, output_dir, workers):
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        assign_module.assign_courses_to_groups(instance_url, "token", courses_file, groups_file, output_dir,
+                                               workers=workers)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs concurrent course assignment against a local stub server.")
+    parser.add_argument("--groups", type=int, default=500,
+                        help="Number of groups on the stub server; those following the naming convention are assigned (default: 500)")
+    parser.add_argument("--courses", type=int, default=100, help="Number of courses on the stub server (default: 100)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated server latency in seconds (default: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts to compare")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.groups, args.courses, latency=args.latency, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate)
+    instance_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_assignment_inputs(server.RequestHandlerClass.data, directory)
+        courses_file = os.path.join(directory, "courses.csv")
+        groups_file = os.path.join(directory, "groups.csv")
+        baseline = None
+        for workers in args.workers:
+            output_dir = os.path.join(directory, f"out_{workers}")
+            os.makedirs(output_dir)
+            stub_request(server, "POST", "/__reset")
+            elapsed = run(instance_url, courses_file, groups_file, output_dir, workers)
+            requests_sent = stub_request(server, "GET", "/__stats")["requests"]
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} requests={requests_sent} time={elapsed:.2f}s "
+                  f"rate={requests_sent / elapsed:.0f} req/s speedup={baseline / elapsed:.1f}x")
+
+    server.shutdown()
@@ -0,0 +1,77 @@
+import csv
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lp_json_stream import iter_json_array, count_json_array
+
+CHUNK_SIZE = 64 * 1024
+
+def write_groups_payload(path, group_count):
+    # Synthetic /api/v1/Groups response with a few extra fields per group
+    with open(path, mode="w", encoding="utf-8") as file:
+        file.write("[")
+        for group_id in range(group_count):
+            if group_id:
+                file.write(",")
+            json.dump({"GroupId": group_id, "GroupName": f"{group_id}-G{group_id % 12 + 1}-EN-Section A",
+                       "Description": "Synthetic group " * 4, "MemberCount": group_id % 40,
+                       "CreatedAt": "2024-12-03T12:33:22Z"}, file)
+        file.write("]")
+
+def read_chunks(path):
+    # Stands in for response.iter_content()
+    with open(path, mode="rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+def run_mode(mode, payload_path, output_path):
+    if mode == "json-csv":
+        with open(payload_path, mode="rb") as file:
+            groups = json.loads(file.read())
+    elif mode == "stream-csv":
+        groups = iter_json_array(read_chunks(payload_path))
+    elif mode == "json-count":
+        with open(payload_path, mode="rb") as file:
+            return len(json.loads(file.read()))
+    else:
+        return count_json_array(read_chunks(payload_path))
+
+    with open(output_path, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Group ID", "Group Name"])
+        for group in groups:
+            writer.writerow([group.get("GroupId"), group.get("GroupName")])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory and wall time of response.json() against streaming parsing of a Groups payload.")
+    parser.add_argument("--groups", type=int, default=500000, help="Number of groups in the synthetic payload (default: 500000)")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PAYLOAD", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Runs in a fresh process so that ru_maxrss only covers this mode
+        start = time.perf_counter()
+        run_mode(*args.child)
+        elapsed = time.perf_counter() - start
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(json.dumps({"time": elapsed, "peak_mb": peak_kb / 1024}))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        payload_path = os.path.join(directory, "groups.json")
+        output_path = os.path.join(directory, "groups.csv")
+        write_groups_payload(payload_path, args.groups)
+        print(f"Payload: {args.groups} groups, {os.path.getsize(payload_path) / (1024 * 1024):.1f} MB")
+
+        for mode in ["json-csv", "stream-csv", "json-count", "stream-count"]:
+            result = subprocess.run([sys.executable, __file__, "--child", mode, payload_path, output_path],
+                                    check=True, stdout=subprocess.PIPE, text=True)
+            stats = json.loads(result.stdout)
+            print(f"{mode:<13} time={stats['time']:.2f}s peak RSS={stats['peak_mb']:.0f} MB")
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+import importlib.util
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "merge-h5p-html-files.py")
+
+def load_merge_module():
+    # The script name contains dashes, so load it from its path
+    spec = importlib.util.spec_from_file_location("merge_h5p_html_files", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def write_lesson(directory, file_count, file_kb):
+    # Numbered standalone exports: a shared library block plus some activity-specific content
+    random.seed(file_count)
+    library = "var H5P = window.H5P || {};\n" + "H5P.lib = function () { return 42; };\n" * (file_kb * 1024 // 39)
+    for number in range(1, file_count + 1):
+        activity = "".join(random.choice("abcdefghij ") for _ in range(2048))
+        with open(os.path.join(directory, f"{number}-Activity {number}.html"), "w", encoding="utf-8") as file:
+            file.write(f"<html><head><script>{library}</script></head><body>"
+                       f"<div style=\"margin: 20px 20px;\"><p>{activity}</p></div></body></html>")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure wall time, peak memory and output size of merging synthetic H5P lessons.")
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 400], help="File counts to generate (default: 100 400)")
+    parser.add_argument("--file-kb", type=int, default=400, help="Approximate size of each file in KB (default: 400)")
+    parser.add_argument("--merge-args", nargs=argparse.REMAINDER, default=[], help="Extra arguments passed to the merger")
+    parser.add_argument("--child", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Runs in a fresh process so that ru_maxrss only covers this merge
+        merge_module = load_merge_module()
+        sys.argv = [SCRIPT_PATH, args.child] + args.merge_args
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            merge_module.main()
+        elapsed = time.perf_counter() - start
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(json.dumps({"time": elapsed, "peak_mb": peak_kb / 1024}))
+        sys.exit(0)
+
+    for file_count in args.files:
+        with tempfile.TemporaryDirectory() as directory:
+            write_lesson(directory, file_count, args.file_kb)
+            input_mb = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / (1024 * 1024)
+            result = subprocess.run([sys.executable, __file__, "--child", directory, "--merge-args", *args.merge_args],
+                                    check=True, stdout=subprocess.PIPE, text=True)
+            stats = json.loads(result.stdout)
+            output_mb = os.path.getsize(os.path.join(directory, "index.html")) / (1024 * 1024)
+            print(f"files={file_count:<5} input={input_mb:.0f} MB output={output_mb:.0f} MB "
+                  f"time={stats['time']:.2f}s peak RSS={stats['peak_mb']:.0f} MB")
@@ -0,0 +1,63 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from replace_vars_custom import parse_config, replace_variables
+
+def legacy_replace_variables(input_path, output_path, variables):
+    # The previous implementation: one regex substitution over the whole content per variable
+    with open(input_path, 'r') as f:
+        content = f.read()
+    for name, value in variables.items():
+        pattern = rf'\{{\{{\s*{re.escape(name)}\s*\}}\}}'
+        content = re.sub(pattern, value, content)
+    with open(output_path, 'w') as f:
+        f.write(content)
+
+def write_inputs(directory, variable_count, input_mb):
+    random.seed(variable_count)
+    config_path = os.path.join(directory, "config.txt")
+    input_path = os.path.join(directory, "input.txt")
+    with open(config_path, "w") as f:
+        for index in range(variable_count):
+            f.write(f"var_{index} = value number {index}\n")
+    # Prose with a placeholder every few hundred characters
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. " * 3
+    with open(input_path, "w") as f:
+        written = 0
+        while written < input_mb * 1024 * 1024:
+            text = f"{line}{{{{ var_{random.randrange(variable_count)} }}}}\n"
+            f.write(text)
+            written += len(text)
+    return config_path, input_path
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-pass template rendering against per-variable regex substitution.")
+    parser.add_argument("--variables", type=int, default=1000, help="Number of config variables (default: 1000)")
+    parser.add_argument("--input-mb", type=int, default=5, help="Size of the input file in MB (default: 5)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current implementation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, input_path = write_inputs(directory, args.variables, args.input_mb)
+        variables = parse_config(config_path)
+        output_path = os.path.join(directory, "output.txt")
+        legacy_output_path = os.path.join(directory, "legacy_output.txt")
+
+        current = timed(replace_variables, input_path, output_path, variables)
+        print(f"single pass: {current:.2f}s ({args.variables} variables, {args.input_mb} MB)")
+        if not args.skip_legacy:
+            legacy = timed(legacy_replace_variables, input_path, legacy_output_path, variables)
+            with open(output_path) as current_file, open(legacy_output_path) as legacy_file:
+                identical = current_file.read() == legacy_file.read()
+            print(f"per-variable regex: {legacy:.2f}s, speedup {legacy / current:.0f}x, identical output: {identical}")
@@ -0,0 +1,200 @@
+import re
+import csv
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for a Learning Passport instance, for benchmarks and manual testing. Implements
+# the endpoints the scripts use on a synthetic dataset, with configurable latency, error rate and
+# 429 throttling. GET /__stats returns request counters; POST /__reset clears them.
+
+GRADES = ["KG1", "KG2", "KG3", "G1", "G2", "G3", "G4", "G5", "G6", "G7", "G8", "G9", "G10"]
+LANGUAGES = ["EN", "FR", "AR"]
+CHUNK_SIZE = 64 * 1024
+
+class StubData:
+    """Synthetic groups, courses and group->course assignments."""
+
+    def __init__(self, groups, courses, seed=0):
+        rnd = random.Random(seed)
+        self.courses = [
+            {"Id": course_id, "ParentId": course_id % 20 + 1, "ContentLanguage": rnd.choice(["en", "fr", "ar"]),
+             "ParentCourseId": None, "Name": f"Course {course_id}", "Description": "Synthetic course\nfor benchmarks",
+             "Logo": None, "IsCertificate": False, "NumPublishedLessons": course_id % 12,
+             "NumPublishedKCs": course_id % 5}
+            for course_id in range(1, courses + 1)
+        ]
+        self.groups = []
+        for group_id in range(1, groups + 1):
+            # Most groups follow the SchoolID-Grade-Language-* convention
+            if group_id % 10:
+                name = f"{1000 + group_id % 500}-{rnd.choice(GRADES)}-{rnd.choice(LANGUAGES)}-Section {group_id % 4}"
+            else:
+                name = f"Teachers {group_id}"
+            self.groups.append({"GroupId": group_id, "GroupName": name, "Description": "Synthetic group",
+                                "MemberCount": group_id % 40})
+        self.assignments = {}
+        self.lock = threading.Lock()
+
+        self.groups_body = json.dumps(self.groups).encode("utf-8")
+        self.catalog_body = json.dumps({
+            "Offers": [{"Id": category_id, "Names": {"en": f"Category {category_id}"}, "Logo": None}
+                       for category_id in range(1, 21)],
+            "CourseItems": self.courses,
+        }).encode("utf-8")
+
+    def group_courses(self, group_id):
+        with self.lock:
+            course_ids = self.assignments.get(group_id)
+            if course_ids is None:
+                # Every group starts with a couple of courses
+                course_ids = self.assignments[group_id] = {group_id % len(self.courses) + 1, 1} if self.courses else set()
+            return sorted(course_ids)
+
+    def add_courses(self, group_id, course_ids):
+        self.group_courses(group_id)
+        with self.lock:
+            self.assignments[group_id].update(course_ids)
+
+def write_assignment_inputs(data, directory):
+    """Write courses.csv (covering every grade/language pair) and the filtered groups.csv of the dataset,
+    as inputs for lebanon_assign_courses_to_groups.py."""
+    pairs = [(grade, language) for grade in GRADES for language in LANGUAGES]
+    with open(os.path.join(directory, "courses.csv"), mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Course ID", "Grade", "Language"])
+        for index, course in enumerate(data.courses):
+            writer.writerow([course["Id"], *pairs[index % len(pairs)]])
+    with open(os.path.join(directory, "groups.csv"), mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Group ID", "Group Name", "Grade", "Language"])
+        for group in data.groups:
+            parts = group["GroupName"].split("-", 3)
+            if len(parts) == 4:
+                writer.writerow([group["GroupId"], group["GroupName"], parts[1], parts[2]])
+
+def make_handler(data, latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=0):
+    rnd = random.Random(seed)
+    rnd_lock = threading.Lock()
+    stats = {"requests": 0, "errors": 0, "throttled": 0, "not_modified": 0, "bytes_out": 0}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def count(self, key, amount=1):
+            with stats_lock:
+                stats[key] += amount
+
+        def send_body(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for start in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(body[start:start + CHUNK_SIZE])
+            self.count("bytes_out", len(body))
+
+        def send_cacheable(self, body):
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.count("not_modified")
+                return self.send_body(304, headers={"ETag": etag})
+            self.send_body(200, body, {"ETag": etag})
+
+        def injected_failure(self):
+            # Latency, 500s and 429s apply to every API request
+            self.count("requests")
+            if latency:
+                time.sleep(latency)
+            with rnd_lock:
+                roll = rnd.random()
+            if roll < error_rate:
+                self.count("errors")
+                self.send_body(500, b'{"error": "injected"}')
+                return True
+            if roll < error_rate + throttle_rate:
+                self.count("throttled")
+                self.send_body(429, b'{"error": "throttled"}', {"Retry-After": str(retry_after)})
+                return True
+            return False
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                with stats_lock:
+                    body = json.dumps(stats).encode("utf-8")
+                return self.send_body(200, body)
+            if self.injected_failure():
+                return
+            path = self.path.split("?", 1)[0]
+            match = re.fullmatch(r"/api/v1/Groups/(\d+)/Courses", path)
+            if path == "/api/v1/Groups":
+                self.send_cacheable(data.groups_body)
+            elif path == "/api/v3/admin/categoriesAndCourses":
+                self.send_cacheable(data.catalog_body)
+            elif match:
+                courses = [{"CourseId": course_id} for course_id in data.group_courses(int(match.group(1)))]
+                self.send_body(200, json.dumps(courses).encode("utf-8"))
+            else:
+                self.send_body(404, b'{"error": "not found"}')
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/__reset":
+                with stats_lock:
+                    for key in stats:
+                        stats[key] = 0
+                return self.send_body(204)
+            if self.injected_failure():
+                return
+            match = re.fullmatch(r"/api/v1/Groups/(\d+)/Courses", self.path)
+            if not match:
+                return self.send_body(404, b'{"error": "not found"}')
+            data.add_courses(int(match.group(1)), [course["CourseId"] for course in json.loads(body)])
+            self.send_body(204)
+
+        def log_message(self, format, *args):
+            pass
+
+    Handler.data = data
+    return Handler
+
+def start_stub_server(groups=1000, courses=100, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                      retry_after=1, seed=0, port=0):
+    """Start the stub in a background thread; returns the server (its URL is http://127.0.0.1:<port>)."""
+    data = StubData(groups, courses, seed=seed)
+    handler = make_handler(data, latency, error_rate, throttle_rate, retry_after, seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in Learning Passport server.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--groups", type=int, default=1000, help="Number of groups (default: 1000)")
+    parser.add_argument("--courses", type=int, default=100, help="Number of published courses (default: 100)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429 (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the dataset and injected failures")
+    parser.add_argument("--inputs-dir", help="Also write courses.csv and groups.csv for the assignment script here")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.groups, args.courses, args.latency, args.error_rate, args.throttle_rate,
+                               args.retry_after, args.seed, args.port)
+    if args.inputs_dir:
+        write_assignment_inputs(server.RequestHandlerClass.data, args.inputs_dir)
+    print(f"Stub Learning Passport server listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
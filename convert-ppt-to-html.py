@@ -1,16 +1,43 @@
 import os
+import re
 import sys
+import json
+import heapq
+import hashlib
+import argparse
+import shutil
 import subprocess
+import tempfile
+import threading
 import time
+import zipfile
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
 
-# Check if the executable path and input file/folder are passed as command-line arguments
-if len(sys.argv) < 3:
-    print("Usage: python convert-ppt-to-html.py <ispring_exe_path> <input_folder_or_file>")
-    sys.exit(1)
+# Parse the iSpring executable path, the input file/folder and the scheduling options
+parser = argparse.ArgumentParser(description="Convert PowerPoint files (.pptx) to HTML using the iSpring executable.")
+parser.add_argument("ispring_exe", help="Path to the iSpring executable")
+parser.add_argument("input_path", help="A .pptx file or a directory containing .pptx files")
+parser.add_argument("--workers", type=int, default=1,
+                    help="Number of converter processes to run at once (default: 1)")
+parser.add_argument("--timeout", type=float, default=None,
+                    help="Kill a conversion that runs longer than this many seconds (default: no limit)")
+parser.add_argument("--force", action="store_true",
+                    help="Reconvert every deck even if the manifest shows it is unchanged")
+parser.add_argument("--dedupe-assets", action="store_true",
+                    help="After converting, move assets repeated across decks into one shared bundle and "
+                         "recompress the deck ZIPs")
+parser.add_argument("--recompress-workers", type=int, default=os.cpu_count() or 1,
+                    help="Number of ZIPs to hash and recompress at once with --dedupe-assets (default: CPU count)")
+args = parser.parse_args()
+
+if args.workers < 1:
+    parser.error("--workers must be at least 1")
+if args.recompress_workers < 1:
+    parser.error("--recompress-workers must be at least 1")
 
-# Get the iSpring executable path and input path from the command-line arguments
-ispring_exe = sys.argv[1]
-input_path = sys.argv[2]
+ispring_exe = args.ispring_exe
+input_path = args.input_path
 
 # Verify if the provided iSpring executable exists
 if not os.path.isfile(ispring_exe):
@@ -22,49 +49,484 @@ if not os.path.exists(input_path):
     print(f"Error: The path '{input_path}' does not exist.")
     sys.exit(1)
 
+# Converter flags; a change here invalidates every cached ZIP
+CONVERTER_FLAGS = [
+    "-fw",
+    "-piq", "0",
+    "-giq", "0",
+    "--advanced-smart-art-processing",
+    "-om", "on",
+    "--skin", "none",
+    "-v",
+]
+FLAGS_SIGNATURE = " ".join(["h", "-f", "solid", "-z"] + CONVERTER_FLAGS)
+MANIFEST_NAME = ".ispring-manifest.json"
+# Per-deck timings of finished runs, used to estimate how long the next run will take
+HISTORY_NAME = ".ispring-history.jsonl"
+HISTORY_SAMPLES = 1000
+
+# Asset deduplication (--dedupe-assets): identical assets found in several deck ZIPs are moved
+# into SHARED_BUNDLE_NAME, next to the manifest, under SHARED_DIR/<hash>/<file name>
+SHARED_BUNDLE_NAME = "shared-assets.zip"
+SHARED_DIR = "shared-assets"
+SHAREABLE_EXTENSIONS = {".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".woff", ".woff2", ".ttf",
+                        ".otf", ".eot", ".mp3", ".m4a", ".mp4", ".webm"}
+REWRITE_EXTENSIONS = {".html", ".htm", ".js", ".css", ".json", ".xml"}
+# Already compressed formats are stored as is; deflating them again costs time and saves nothing
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".mp3", ".m4a", ".mp4", ".webm"}
+MIN_SHARED_ASSET_SIZE = 1024
+
 # Prepare to track success and errors
 success_count = 0
+skipped_count = 0
 error_files = []
+scan_errors = []  # Directories and entries the scan could not read
+converted_mb = 0.0
+deck_timings = []  # (MB, seconds) of each deck converted in this run
+results_lock = threading.Lock()
+
+# Discovery state shared by the scanner thread, the dispatcher and the workers
+queue_state = threading.Condition()
+pending_heap = []  # (-size, path) of decks waiting to be converted, largest first
+running = {}  # path -> (MB, start time)
+discovered_count = 0
+scan_done = False
+
+def load_manifest(manifest_path):
+    # The manifest maps each deck to the content hash, flags and ZIP of its last successful conversion
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable manifest '{manifest_path}': {e}")
+        return {}
+
+def save_manifest():
+    # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def manifest_key(pptx_path):
+    return os.path.relpath(pptx_path, manifest_dir).replace(os.sep, "/")
+
+def is_unchanged(pptx_path, entry, stat, sha256=None):
+    # A deck is unchanged when its content and the converter flags match the last successful conversion
+    if args.force or not entry or entry.get("flags") != FLAGS_SIGNATURE:
+        return False
+    if not os.path.exists(os.path.join(os.path.dirname(pptx_path), entry["zip"])):
+        return False
+    if sha256 is None:
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+    return entry.get("sha256") == sha256
+
+def load_history(history_path):
+    # (MB, seconds) of the most recent decks converted by earlier runs
+    samples = []
+    if os.path.exists(history_path):
+        try:
+            with open(history_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    samples.extend(json.loads(line).get("decks", []))
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable history '{history_path}': {e}")
+    return samples[-HISTORY_SAMPLES:]
+
+def append_history(history_path, run_seconds):
+    record = {
+        "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "workers": args.workers,
+        "seconds": round(run_seconds, 3),
+        "converted": success_count,
+        "mb": round(converted_mb, 3),
+        "decks": [[round(mb, 3), round(seconds, 3)] for mb, seconds in deck_timings],
+    }
+    with open(history_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+
+def fit_throughput(samples):
+    """Fit seconds = overhead + MB * seconds_per_mb to (MB, seconds) samples by least squares."""
+    if not samples:
+        return None
+    count = len(samples)
+    mean_mb = sum(mb for mb, _ in samples) / count
+    mean_seconds = sum(seconds for _, seconds in samples) / count
+    spread = sum((mb - mean_mb) ** 2 for mb, _ in samples)
+    if spread > 0:
+        seconds_per_mb = sum((mb - mean_mb) * (seconds - mean_seconds) for mb, seconds in samples) / spread
+        if seconds_per_mb > 0:
+            return max(mean_seconds - seconds_per_mb * mean_mb, 0.0), seconds_per_mb
+    # All decks the same size (or a negative slope): a fixed rate through the origin
+    return 0.0, mean_seconds / mean_mb if mean_mb else 0.0
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def total_label():
+    # The number of decks to convert is only known once the scan has finished
+    return f"{discovered_count}" if scan_done else f"{discovered_count}+"
+
+def print_progress():
+    with results_lock:
+        samples = history_samples + deck_timings
+        done_mb = sum(mb for mb, _ in deck_timings)
+    with queue_state:
+        waiting_mb = [-size / (1024 * 1024) for size, _ in pending_heap]
+        running_decks = list(running.values())
+        done = discovered_count - len(pending_heap) - len(running)
+        total = total_label()
+
+    message = f"Progress: {done}/{total} decks done ({done_mb:.2f} MB converted)"
+    model = fit_throughput(samples)
+    if model:
+        overhead, seconds_per_mb = model
+        now = time.time()
+        remaining = sum(overhead + mb * seconds_per_mb for mb in waiting_mb)
+        remaining += sum(max(overhead + mb * seconds_per_mb - (now - start), 0.0) for mb, start in running_decks)
+        message += (f", ~{60 / seconds_per_mb if seconds_per_mb else 0:.1f} MB/min per worker, "
+                    f"ETA {format_duration(remaining / args.workers)}")
+        if not scan_done:
+            message += " for the decks found so far"
+    print(message, flush=True)
+
+def scan_pptx_files(directory):
+    """Yield (path, stat) of every .pptx file under directory, as the scan reaches it."""
+    try:
+        with os.scandir(directory) as entries:
+            subdirectories = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.name.endswith(".pptx") and entry.is_file():
+                        # On Windows the stat comes with the directory listing, without another round trip
+                        yield entry.path, entry.stat()
+                except OSError as e:
+                    print(f"Error: cannot scan '{entry.path}': {e}")
+                    scan_errors.append(entry.path)
+    except OSError as e:
+        print(f"Error: cannot scan '{directory}': {e}")
+        scan_errors.append(directory)
+        return
+    for subdirectory in subdirectories:
+        yield from scan_pptx_files(subdirectory)
+
+def discover(paths):
+    """Queue the decks that need converting while the scan runs, then remove ZIPs of deleted decks."""
+    global discovered_count, skipped_count, scan_done
+    present = set()
+    unchanged_count = 0
+    try:
+        for pptx_path, stat in paths:
+            key = manifest_key(pptx_path)
+            present.add(key)
+            # Skip decks whose size and modification time still match the manifest, without reading them
+            with results_lock:
+                unchanged = is_unchanged(pptx_path, manifest.get(key), stat)
+                if unchanged:
+                    skipped_count += 1
+            if unchanged:
+                unchanged_count += 1
+                continue
+            with queue_state:
+                heapq.heappush(pending_heap, (-stat.st_size, pptx_path))
+                discovered_count += 1
+                queue_state.notify_all()
+    finally:
+        with queue_state:
+            scan_done = True
+            queue_state.notify_all()
+
+    print(f"\nScan finished: {len(present)} decks found, {unchanged_count} unchanged (use --force to reconvert them), "
+          f"{discovered_count} to convert.", flush=True)
+    # Remove ZIPs of decks that were deleted since they were converted. Decks in a part of the tree
+    # that couldn't be scanned would look deleted too, so nothing is removed after a scan error.
+    if scan_errors:
+        print(f"Not removing stale ZIPs: part of the tree could not be scanned ({len(scan_errors)} paths).", flush=True)
+    elif os.path.isdir(input_path):
+        with results_lock:
+            for key in [key for key in manifest if key not in present]:
+                stale_zip = os.path.join(manifest_dir, os.path.dirname(key), manifest[key]["zip"])
+                if os.path.exists(stale_zip):
+                    os.remove(stale_zip)
+                    print(f"Removed stale ZIP: {stale_zip}")
+                del manifest[key]
+            save_manifest()
+    return len(present)
+
+def record_error(pptx_path, message):
+    with results_lock:
+        error_files.append(pptx_path)
+        manifest.pop(manifest_key(pptx_path), None)
+        save_manifest()
+        print(message, flush=True)
+
+def deck_finished(future, pptx_path):
+    # Anything process_pptx_file didn't catch itself still counts as a failed deck
+    error = future.exception()
+    if error is not None:
+        record_error(pptx_path, f"\nAn unexpected error occurred while processing {pptx_path}: {error}")
+    with queue_state:
+        running.pop(pptx_path, None)
+        queue_state.notify_all()
+    print_progress()
+
+def kill_process_tree(process):
+    # iSpring drives PowerPoint through child processes, so kill the whole tree on Windows
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        process.kill()
+
+def extension_of(name):
+    return os.path.splitext(name)[1].lower()
+
+def relative_path(target, start):
+    # Path of target relative to the directory start; both are "/"-separated and relative to the same root
+    target_parts = [part for part in target.split("/") if part]
+    start_parts = [part for part in start.split("/") if part]
+    common = 0
+    while common < min(len(target_parts), len(start_parts)) and target_parts[common] == start_parts[common]:
+        common += 1
+    return "/".join([".."] * (len(start_parts) - common) + target_parts[common:])
+
+def hash_zip_entries(zip_path):
+    # Map each file in the ZIP to its (SHA-256, size)
+    entries = {}
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            digest = hashlib.sha256()
+            with archive.open(info) as file:
+                while chunk := file.read(1024 * 1024):
+                    digest.update(chunk)
+            entries[info.filename] = (digest.hexdigest(), info.file_size)
+    return entries
+
+def shared_asset_name(sha256, name):
+    return f"{SHARED_DIR}/{sha256[:16]}/{posixpath.basename(name)}"
+
+def write_zip(zip_path, members):
+    # members yields (ZipInfo, data); the ZIP is recompressed at the highest deflate level
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for info, data in members:
+            entry = zipfile.ZipInfo(info.filename, info.date_time)
+            entry.external_attr = info.external_attr
+            if extension_of(info.filename) in STORED_EXTENSIONS:
+                entry.compress_type = zipfile.ZIP_STORED
+                archive.writestr(entry, data)
+            else:
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(entry, data, compresslevel=9)
+
+def dedupe_deck_zip(zip_path, deck_root, entries, shared):
+    """Replace the deck's references to shared assets with paths into the shared bundle, drop the assets
+    no longer referenced from the deck and recompress it.
+    Returns (old size, new size, hashes of the referenced shared assets, number of assets dropped)."""
+    old_size = os.path.getsize(zip_path)
+    candidates = {name: shared[sha256] for name, (sha256, size) in entries.items() if sha256 in shared}
+    with zipfile.ZipFile(zip_path) as archive:
+        texts = {name: archive.read(name).decode("utf-8", "surrogateescape")
+                 for name in entries if extension_of(name) in REWRITE_EXTENSIONS}
+
+        # Shared JS is moved unchanged and resolves its paths against the page, which stays in the
+        # deck, so anything it mentions has to stay in the deck too
+        pinned = {candidate for name, text in texts.items() if name in candidates
+                  for candidate in candidates if candidate in text}
+        movable = {name: target for name, target in candidates.items() if name not in pinned}
+
+        referenced = set()
+        rewritten = {}
+        residuals = []
+        for name, text in texts.items():
+            if name in candidates:
+                continue
+            if not movable:
+                residuals.append(text)
+                continue
+            # References are relative to the file itself (HTML, CSS) or to the deck's page (JS)
+            file_dir = posixpath.join(deck_root, posixpath.dirname(name))
+            forms = {}
+            for asset, target in movable.items():
+                forms[asset] = (asset, relative_path(target, deck_root))
+                forms[relative_path(f"{deck_root}/{asset}", file_dir)] = (asset, relative_path(target, file_dir))
+            alternatives = "|".join(re.escape(form) for form in sorted(forms, key=len, reverse=True))
+            pattern = re.compile(rf"(?<![\w./-])(?:\./)?({alternatives})(?![\w./-])")
+
+            def replace(match):
+                asset, replacement = forms[match.group(1)]
+                referenced.add(asset)
+                return replacement
+
+            new_text = pattern.sub(replace, text)
+            if new_text != text:
+                rewritten[name] = new_text.encode("utf-8", "surrogateescape")
+            residuals.append(pattern.sub("", text))
+
+        # An asset may also be loaded through a path that wasn't recognised ("../data/a.png", or one
+        # computed in JS), so it stays in the deck unless its file name appears nowhere else
+        moved = {asset for asset in referenced
+                 if not any(posixpath.basename(asset) in residual for residual in residuals)}
+        members = ((info, rewritten[info.filename] if info.filename in rewritten else archive.read(info))
+                   for info in archive.infolist() if not info.is_dir() and info.filename not in moved)
+        # Written next to the original and swapped in once the original is closed
+        write_zip(f"{zip_path}.tmp", members)
+    os.replace(f"{zip_path}.tmp", zip_path)
+    return old_size, os.path.getsize(zip_path), {entries[name][0] for name in referenced}, len(moved)
+
+def dedupe_assets(zip_paths, workers):
+    """Move assets repeated across the deck ZIPs into the shared bundle and recompress every deck ZIP."""
+    bundle_path = os.path.join(manifest_dir, SHARED_BUNDLE_NAME)
+    bundle_hashes = set()
+    if os.path.exists(bundle_path):
+        with zipfile.ZipFile(bundle_path) as bundle:
+            bundle_hashes = {name.split("/")[1] for name in bundle.namelist() if name.count("/") == 2}
+    bundle_size = os.path.getsize(bundle_path) if os.path.exists(bundle_path) else 0
+
+    # zlib and hashlib release the GIL, so threads hash and deflate on all cores
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        deck_entries = dict(zip(zip_paths, executor.map(hash_zip_entries, zip_paths)))
+
+    # An asset is shared when it is already in the bundle or appears in at least two decks
+    decks_by_hash = {}
+    sources = {}
+    for zip_path, entries in deck_entries.items():
+        for name, (sha256, size) in entries.items():
+            if extension_of(name) in SHAREABLE_EXTENSIONS and size >= MIN_SHARED_ASSET_SIZE:
+                decks_by_hash.setdefault(sha256, set()).add(zip_path)
+                sources.setdefault(sha256, (zip_path, name))
+    shared = {sha256: shared_asset_name(sha256, sources[sha256][1]) for sha256, decks in decks_by_hash.items()
+              if len(decks) > 1 or sha256[:16] in bundle_hashes}
+
+    # Keep the new shared assets before their decks drop them
+    new_assets = {}
+    for sha256, target in shared.items():
+        if sha256[:16] not in bundle_hashes:
+            zip_path, name = sources[sha256]
+            with zipfile.ZipFile(zip_path) as archive:
+                new_assets[sha256] = (archive.getinfo(name), archive.read(name))
+
+    jobs = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for zip_path, entries in deck_entries.items():
+            deck_dir = os.path.relpath(os.path.dirname(zip_path), manifest_dir).replace(os.sep, "/")
+            deck_root = posixpath.normpath(posixpath.join(deck_dir, os.path.splitext(os.path.basename(zip_path))[0]))
+            jobs.append((zip_path, executor.submit(dedupe_deck_zip, zip_path, deck_root, entries, shared)))
+
+    old_total = new_total = 0
+    moved_hashes = set()
+    moved_copies = 0
+    for zip_path, job in jobs:
+        try:
+            old_size, new_size, referenced, dropped = job.result()
+        except Exception as e:
+            print(f"Error deduplicating {zip_path}: {e}")
+            continue
+        old_total += old_size
+        new_total += new_size
+        moved_hashes |= referenced
+        moved_copies += dropped
+
+    # Add the assets that decks now reference to the bundle
+    added = {sha256: new_assets[sha256] for sha256 in moved_hashes if sha256 in new_assets}
+    if added:
+        members = []
+        if os.path.exists(bundle_path):
+            with zipfile.ZipFile(bundle_path) as bundle:
+                members = [(info, bundle.read(info)) for info in bundle.infolist() if not info.is_dir()]
+        for sha256, (info, data) in added.items():
+            members.append((zipfile.ZipInfo(shared[sha256], info.date_time), data))
+        write_zip(f"{bundle_path}.tmp", members)
+        os.replace(f"{bundle_path}.tmp", bundle_path)
+    new_bundle_size = os.path.getsize(bundle_path) if os.path.exists(bundle_path) else 0
+
+    saved = old_total + bundle_size - new_total - new_bundle_size
+    print("\n--- Asset Deduplication ---")
+    print(f"Deck ZIPs: {len(jobs)}, shared assets: {len(moved_hashes)} ({len(added)} new), "
+          f"copies removed from decks: {moved_copies}")
+    print(f"Deck ZIPs: {old_total / (1024 * 1024):.2f} MB -> {new_total / (1024 * 1024):.2f} MB, "
+          f"{SHARED_BUNDLE_NAME}: {bundle_size / (1024 * 1024):.2f} MB -> {new_bundle_size / (1024 * 1024):.2f} MB")
+    if old_total + bundle_size:
+        print(f"Bytes saved: {saved} ({saved / (1024 * 1024):.2f} MB, {saved / (old_total + bundle_size):.1%})")
 
 # Define a function to process a single file
-def process_pptx_file(pptx_path, file_index, total_files):
-    global success_count
+def process_pptx_file(pptx_path, file_index):
+    global success_count, skipped_count, converted_mb
+
+    # A touched but otherwise identical deck only needs its manifest entry refreshed
+    key = manifest_key(pptx_path)
+    try:
+        stat = os.stat(pptx_path)
+        sha256 = file_sha256(pptx_path)
+    except OSError as e:
+        # Deleted or locked between the scan and now
+        record_error(pptx_path, f"\nError reading {pptx_path}: {e}")
+        return
+    with results_lock:
+        entry = manifest.get(key)
+        if is_unchanged(pptx_path, entry, stat, sha256):
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            skipped_count += 1
+            save_manifest()
+            print(f"\nSkipping unchanged file: {pptx_path}", flush=True)
+            return
 
-    # Prepare paths for the ZIP and HTML files
+    # Each job writes its HTML into its own scratch directory so parallel jobs don't clobber each other
     base_dir = os.path.dirname(pptx_path)
     base_name = os.path.splitext(os.path.basename(pptx_path))[0]
     zip_output_path = os.path.join(base_dir, f"{base_name}.zip")
-    html_output_path = os.path.join(base_dir, "index.html")  # Always name the main HTML file index.html
+    work_dir = None
 
     # Get original file size
-    original_file_size = os.path.getsize(pptx_path) / (1024 * 1024)  # Size in MB
+    original_file_size = stat.st_size / (1024 * 1024)  # Size in MB
 
-    # Print the starting delimiter and file info
-    print(f"\n---{file_index}/{total_files}--------------------------")
-    print(f"Processing file: {pptx_path} (Size: {original_file_size:.2f} MB)...")
+    # Collect this job's output and print it as one block, so parallel jobs don't interleave
+    log = []
+    log.append(f"\n---{file_index}/{total_label()}--------------------------")
+    log.append(f"Processing file: {pptx_path} (Size: {original_file_size:.2f} MB)...")
 
     # Start the timer
     start_time = time.time()
 
-    # Build the command
-    command = [
-        ispring_exe,
-        "h",
-        "-f", "solid",
-        "-z", "-zof", zip_output_path,
-        "-fw",
-        "-piq", "0",
-        "-giq", "0",
-        "--advanced-smart-art-processing",
-        "-om", "on",
-        "--skin", "none",
-        "-v", pptx_path,
-        html_output_path
-    ]
-
+    succeeded = False
     try:
-        # Execute the command with real-time output
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        work_dir = tempfile.mkdtemp(prefix=f"{base_name}_")
+        html_output_path = os.path.join(work_dir, "index.html")  # Always name the main HTML file index.html
+
+        # Build the command
+        command = [
+            ispring_exe,
+            "h",
+            "-f", "solid",
+            "-z", "-zof", zip_output_path,
+            *CONVERTER_FLAGS,
+            pptx_path,
+            html_output_path
+        ]
+
+        # Execute the command, killing it if it exceeds the timeout
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            stdout, stderr = process.communicate(timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(process)
+            process.communicate()
+            raise
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
 
         # Stop the timer and calculate processing time
         processing_time = time.time() - start_time
@@ -75,45 +537,109 @@ def process_pptx_file(pptx_path, file_index, total_files):
         else:
             resulting_file_size = 0
 
-        print(f"Successfully converted: {pptx_path} to {zip_output_path}")
-        print(f" - Processing time: {processing_time:.2f} seconds")
-        print(f" - Resulting ZIP size: {resulting_file_size:.2f} MB")
-        success_count += 1
+        log.append(f"Successfully converted: {pptx_path} to {zip_output_path}")
+        log.append(f" - Processing time: {processing_time:.2f} seconds")
+        log.append(f" - Resulting ZIP size: {resulting_file_size:.2f} MB")
+        succeeded = True
+    except subprocess.TimeoutExpired:
+        log.append(f"Error converting {pptx_path}: killed after exceeding the {args.timeout:.0f} second timeout")
     except subprocess.CalledProcessError as e:
-        print(f"Error converting {pptx_path}:")
-        print(f" - Command: {' '.join(command)}")
-        print(f" - Exit Code: {e.returncode}")
-        print(f" - Stdout: {e.stdout.decode().strip() if e.stdout else 'None'}")
-        print(f" - Stderr: {e.stderr.decode().strip() if e.stderr else 'None'}")
-        error_files.append(pptx_path)
+        log.append(f"Error converting {pptx_path}:")
+        log.append(f" - Command: {' '.join(command)}")
+        log.append(f" - Exit Code: {e.returncode}")
+        log.append(f" - Stdout: {e.stdout.decode().strip() if e.stdout else 'None'}")
+        log.append(f" - Stderr: {e.stderr.decode().strip() if e.stderr else 'None'}")
     except Exception as e:
-        print(f"An unexpected error occurred while processing {pptx_path}: {e}")
-        error_files.append(pptx_path)
+        log.append(f"An unexpected error occurred while processing {pptx_path}: {e}")
     finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
         # Add a clear ending delimiter after processing each file
-        print("-----------------------------")
+        log.append("-----------------------------")
+
+    with results_lock:
+        if succeeded:
+            success_count += 1
+            converted_mb += original_file_size
+            deck_timings.append((original_file_size, processing_time))
+            manifest[key] = {
+                "sha256": sha256,
+                "flags": FLAGS_SIGNATURE,
+                "zip": os.path.basename(zip_output_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        else:
+            error_files.append(pptx_path)
+            manifest.pop(key, None)
+        save_manifest()
+        print("\n".join(log), flush=True)
 
-# If the input is a directory, process all .pptx files in the directory
+# If the input is a directory, process all .pptx files under it, including subdirectories
 if os.path.isdir(input_path):
-    pptx_files = [os.path.join(input_path, file_name) for file_name in os.listdir(input_path) if file_name.endswith(".pptx")]
-    total_files = len(pptx_files)
-    for index, pptx_file in enumerate(pptx_files, start=1):
-        process_pptx_file(pptx_file, index, total_files)
+    pptx_paths = scan_pptx_files(input_path)
+    manifest_dir = input_path
 # If the input is a single file, process only that file
 elif os.path.isfile(input_path) and input_path.endswith(".pptx"):
-    process_pptx_file(input_path, 1, 1)
+    pptx_paths = [(input_path, os.stat(input_path))]
+    # A bare file name has no directory part; the manifest goes in the current directory then
+    manifest_dir = os.path.dirname(input_path) or "."
 else:
     print(f"Error: Unsupported file type or invalid input '{input_path}'. Please provide a .pptx file or directory.")
     sys.exit(1)
 
+manifest_path = os.path.join(manifest_dir, MANIFEST_NAME)
+manifest = load_manifest(manifest_path)
+history_path = os.path.join(manifest_dir, HISTORY_NAME)
+history_samples = load_history(history_path)
+
+# The scan runs in the background and conversions start as soon as it finds the first deck.
+# Of the decks found so far, the largest start first so a huge deck isn't left running alone at the end.
+run_start = time.time()
+scan_result = []
+scanner = threading.Thread(target=lambda: scan_result.append(discover(pptx_paths)), daemon=True)
+scanner.start()
+started_count = 0
+with ThreadPoolExecutor(max_workers=args.workers) as executor:
+    with queue_state:
+        while True:
+            while pending_heap and len(running) < args.workers:
+                size, pptx_file = heapq.heappop(pending_heap)
+                started_count += 1
+                running[pptx_file] = (-size / (1024 * 1024), time.time())
+                future = executor.submit(process_pptx_file, pptx_file, started_count)
+                future.add_done_callback(lambda future, path=pptx_file: deck_finished(future, path))
+            if scan_done and not pending_heap and not running:
+                break
+            queue_state.wait()
+scanner.join()
+run_seconds = time.time() - run_start
+if deck_timings:
+    append_history(history_path, run_seconds)
+
 # Print final summary
 print("\n--- Conversion Summary ---")
-total_files = len(pptx_files) if os.path.isdir(input_path) else 1
-print(f"Total files processed: {total_files}")
+print(f"Total files processed: {scan_result[0] if scan_result else 0}")
 print(f"Successfully converted: {success_count}")
+print(f"Skipped (unchanged): {skipped_count}")
+if success_count and run_seconds > 0:
+    run_minutes = run_seconds / 60
+    print(f"Throughput: {success_count / run_minutes:.2f} decks/min, {converted_mb / run_minutes:.2f} MB/min "
+          f"({args.workers} workers, {run_seconds:.2f} seconds)")
 if error_files:
     print(f"Files with errors ({len(error_files)}):")
     for error_file in error_files:
         print(f" - {error_file}")
-else:
+if scan_errors:
+    print(f"Paths that could not be scanned ({len(scan_errors)}):")
+    for scan_error in scan_errors:
+        print(f" - {scan_error}")
+if not error_files and not scan_errors:
     print("No errors encountered.")
+
+# Deduplicate across every deck in the manifest, including ones skipped in this run
+if args.dedupe_assets:
+    deck_zips = [os.path.join(manifest_dir, os.path.dirname(key), entry["zip"]) for key, entry in sorted(manifest.items())]
+    deck_zips = [zip_path for zip_path in deck_zips if os.path.exists(zip_path)]
+    if deck_zips:
+        dedupe_assets(deck_zips, args.recompress_workers)
@@ -2,84 +2,240 @@ import sys
 import os
 import requests
 import json
+import csv
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from urllib.parse import urlparse
+from lp_api_client import LPClient
+from lp_http_cache import ResponseCache, DEFAULT_MAX_BYTES
+from lp_snapshot_store import SnapshotStore
+import lp_metrics
 
-def fetch_and_process_courses(instance_url, bearer_token, output_directory):
-    api_endpoint = f"{instance_url}/api/v3/admin/categoriesAndCourses?publishedCourses=true"
-    headers = {
-        "Authorization": f"Bearer {bearer_token}",
-        "Accept": "application/json"
-    }
+def instance_name(instance_url):
+    # First label of the host (e.g. 'yhub' for https://yhub.learningpassport.org)
+    return instance_url.split("//")[1].split(".")[0]
 
-    try:
-        # Fetch the data from API
-        response = requests.get(api_endpoint, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        # Process the data
-        categories = [
-            {
-                "Id": offer["Id"],
-                "Names": offer["Names"],
-                "Logo": offer["Logo"]
-            }
-            for offer in data.get("Offers", [])
-        ]
-
-        courses = [
-            {
-                "CourseID": course["Id"],
-                "URL": f"{instance_url}/#/course/{course['Id']}/item/null",
-                "CategoryID": course["ParentId"],
-                "ContentLanguage": course["ContentLanguage"],
-                "ParentCourseId": course["ParentCourseId"],
-                "Name": course["Name"].replace("\n", " "),
-                "Description": course["Description"].replace("\n", "<br>"),
-                "Logo": course["Logo"],
-                "IsCertificate": course["IsCertificate"],
-                "NumPublishedLessons": course["NumPublishedLessons"],
-                "NumPublishedKCs": course["NumPublishedKCs"]
-            }
-            for course in data.get("CourseItems", [])
-        ]
-
-        processed_data = {
-            "Categories": categories,
-            "Courses": courses
+def instance_host(instance_url):
+    # Host and port of the instance, usable as a file or folder name
+    return urlparse(instance_url).netloc.replace(":", "_")
+
+def instance_names(instance_urls):
+    # Short names, except for instances sharing a first label, which are told apart by their full host
+    short_names = [instance_name(instance_url) for instance_url in instance_urls]
+    return {instance_url: instance_host(instance_url) if short_names.count(short_name) > 1 else short_name
+            for instance_url, short_name in zip(instance_urls, short_names)}
+
+def normalize_instances(instances):
+    # Drop trailing slashes and repeated instances, keeping the first token given for each
+    unique = {}
+    for instance_url, bearer_token in instances:
+        instance_url = instance_url.rstrip("/")
+        if instance_url in unique:
+            print(f"Skipping duplicate instance: {instance_url}")
+            continue
+        unique[instance_url] = bearer_token
+    return list(unique.items())
+
+def iter_categories(data):
+    for offer in data.get("Offers", []):
+        yield {
+            "Id": offer["Id"],
+            "Names": offer["Names"],
+            "Logo": offer["Logo"]
         }
 
+def iter_courses(data, instance_url):
+    for course in data.get("CourseItems", []):
+        yield {
+            "CourseID": course["Id"],
+            "URL": f"{instance_url}/#/course/{course['Id']}/item/null",
+            "CategoryID": course["ParentId"],
+            "ContentLanguage": course["ContentLanguage"],
+            "ParentCourseId": course["ParentCourseId"],
+            "Name": course["Name"].replace("\n", " "),
+            "Description": course["Description"].replace("\n", "<br>"),
+            "Logo": course["Logo"],
+            "IsCertificate": course["IsCertificate"],
+            "NumPublishedLessons": course["NumPublishedLessons"],
+            "NumPublishedKCs": course["NumPublishedKCs"]
+        }
+
+def write_json_list(file, name, records, last):
+    # Write one "name": [...] member record by record, laid out as json.dump(indent=4) would
+    count = 0
+    file.write(f'    "{name}": [')
+    for record in records:
+        text = json.dumps(record, indent=4, ensure_ascii=False).replace("\n", "\n        ")
+        file.write(("," if count else "") + "\n        " + text)
+        count += 1
+    file.write("\n    ]" if count else "]")
+    file.write("\n" if last else ",\n")
+    return count
+
+def fetch_and_process_courses(instance_url, bearer_token, output_directory, cache=None,
+                              snapshot_dir=None, write_json=True, name=None):
+    """Fetch one instance's catalog and write it to a file; returns (categories, courses, file path) or None.
+    `name` prefixes the file and names the snapshot folder (default: the first label of the host)."""
+    try:
+        # Fetch the data from API, revalidating the cached copy when a cache is given
+        path = "/api/v3/admin/categoriesAndCourses"
+        params = {"publishedCourses": "true"}
+        headers = {"Accept": "application/json"}
+        with LPClient(instance_url, bearer_token) as client:
+            with lp_metrics.metrics.stage("fetch"):
+                if cache:
+                    response = cache.get(client, path, params=params, headers=headers)
+                else:
+                    response = client.get(path, params=params, headers=headers)
+                response.raise_for_status()
+            with lp_metrics.metrics.stage("parse"):
+                data = response.json()
+        if getattr(response, "from_cache", False):
+            print(f"{instance_url}: catalog not modified since the last run; using the cached response.")
+
         # Prepare output file name
-        domain_name = instance_url.split("//")[1].split(".")[0]  # Extract domain prefix (e.g., 'yhub')
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")  # Current date and time
+        domain_name = name or instance_name(instance_url)
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")  # Current date and time
         file_name = f"{domain_name}_courses_{timestamp}.json"
         file_path = os.path.join(output_directory, file_name)
 
-        # Write to file
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(processed_data, file, indent=4, ensure_ascii=False)
+        # Process the data and write it to file record by record
+        if write_json:
+            with lp_metrics.metrics.stage("transform_write"), open(file_path, "w", encoding="utf-8") as file:
+                file.write("{\n")
+                category_count = write_json_list(file, "Categories", iter_categories(data), last=False)
+                course_count = write_json_list(file, "Courses", iter_courses(data, instance_url), last=True)
+                file.write("}")
+        else:
+            file_path = None
+
+        # Record the run in the snapshot store; only what changed since the previous run is kept
+        if snapshot_dir:
+            with lp_metrics.metrics.stage("snapshot"):
+                store = SnapshotStore(os.path.join(snapshot_dir, domain_name))
+                entry = store.write(iter_categories(data), iter_courses(data, instance_url), timestamp=now)
+            category_count, course_count = entry["categories"], entry["courses"]
+            print(f"{instance_url}: snapshot run {entry['run']} ({'base' if entry['base'] else 'delta'}): "
+                  f"{entry['added']} added, {entry['changed']} changed, {entry['removed']} removed.")
+            file_path = file_path or store.run_path(entry)
 
         # Output results
-        print(f"{len(categories)} categories and {len(courses)} courses retrieved.")
-        print(f"Data saved to {file_path}")
+        print(f"{instance_url}: {category_count} categories and {course_count} courses retrieved.")
+        if write_json:
+            print(f"Data saved to {file_path}")
+        return category_count, course_count, file_path
 
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching data: {e}")
+        print(f"Error fetching data from {instance_url}: {e}")
     except Exception as e:
-        print(f"Error processing data: {e}")
+        print(f"Error processing data from {instance_url}: {e}")
+    return None
+
+def read_instances_file(instances_file):
+    # One instance per line: URL and token separated by whitespace or a comma; '#' starts a comment
+    instances = []
+    with open(instances_file, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.replace(",", " ").split()
+            if len(fields) != 2:
+                print(f"Skipping invalid line: {line}")
+                continue
+            instances.append((fields[0], fields[1]))
+    return instances
+
+def fetch_all_instances(instances, output_directory, cache=None, max_concurrency=8, snapshot_dir=None, write_json=True):
+    # Fetch every instance concurrently; each writes its own file as soon as its fetch finishes
+    results = {}
+    names = instance_names([instance_url for instance_url, _ in instances])
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {
+            executor.submit(fetch_and_process_courses, instance_url, bearer_token, output_directory, cache,
+                            snapshot_dir, write_json, names[instance_url]): instance_url
+            for instance_url, bearer_token in instances
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    # Combined summary, in the order the instances were given
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = os.path.join(output_directory, f"courses_summary_{timestamp}.csv")
+    with open(summary_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Instance", "Categories", "Courses", "Result"])
+        print("\n--- Summary ---")
+        for instance_url, _ in instances:
+            result = results[instance_url]
+            if result:
+                category_count, course_count, file_path = result
+                writer.writerow([instance_url, category_count, course_count, file_path])
+                print(f"{instance_url}: {category_count} categories, {course_count} courses")
+            else:
+                writer.writerow([instance_url, "", "", "Failed"])
+                print(f"{instance_url}: failed")
+    print(f"Summary saved to {summary_path}")
+
+    return [instance_url for instance_url, _ in instances if not results[instance_url]]
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python fetch_courses.py <instance_url> <bearer_token> <output_directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Fetch the published categories and courses of one or more Learning Passport instances.",
+        usage="%(prog)s [options] <instance_url> <bearer_token> <output_directory>\n"
+              "       %(prog)s [options] (--instances FILE | --instance URL TOKEN ...) <output_directory>")
+    parser.add_argument("arguments", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--instances", metavar="FILE",
+                        help="File listing one instance URL and its token per line")
+    parser.add_argument("--instance", nargs=2, action="append", metavar=("URL", "TOKEN"), default=[],
+                        help="An instance URL and its token; may be repeated")
+    parser.add_argument("--max-concurrency", type=int, default=8,
+                        help="Maximum number of instances fetched at once (default: 8)")
+    parser.add_argument("--cache-dir", help="Cache responses here and only download them again when they change")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Maximum size of the response cache in MB (default: %(default)s)")
+    parser.add_argument("--snapshot-dir",
+                        help="Also record each run in a compact base + delta snapshot store (see lp_snapshot_store.py)")
+    parser.add_argument("--snapshot-only", action="store_true",
+                        help="Don't write the timestamped JSON file; only record the run in --snapshot-dir")
+    lp_metrics.add_arguments(parser)
+    args = parser.parse_args()
 
-    instance_url = sys.argv[1]
-    bearer_token = sys.argv[2]
-    output_directory = sys.argv[3]
+    instances = [tuple(instance) for instance in args.instance]
+    if args.instances:
+        instances += read_instances_file(args.instances)
+    instances = normalize_instances(instances)
+    if instances:
+        if len(args.arguments) != 1:
+            parser.error("only <output_directory> is expected with --instances/--instance")
+        output_directory = args.arguments[0]
+    else:
+        if len(args.arguments) != 3:
+            parser.error("expected <instance_url> <bearer_token> <output_directory>")
+        instance_url, bearer_token, output_directory = args.arguments
+        instance_url = instance_url.rstrip("/")
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.snapshot_only and not args.snapshot_dir:
+        parser.error("--snapshot-only requires --snapshot-dir")
 
     # Validate output directory
     if not os.path.isdir(output_directory):
         print(f"Error: {output_directory} is not a valid directory.")
         sys.exit(1)
 
-    fetch_and_process_courses(instance_url, bearer_token, output_directory)
+    cache = ResponseCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    lp_metrics.enable_from_args(args)
+    try:
+        if instances:
+            failed = fetch_all_instances(instances, output_directory, cache=cache, max_concurrency=args.max_concurrency,
+                                         snapshot_dir=args.snapshot_dir, write_json=not args.snapshot_only)
+            if failed:
+                sys.exit(1)
+        else:
+            fetch_and_process_courses(instance_url, bearer_token, output_directory, cache=cache,
+                                      snapshot_dir=args.snapshot_dir, write_json=not args.snapshot_only)
+    finally:
+        lp_metrics.write_reports(args)
@@ -0,0 +1,158 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from urllib3.exceptions import NewConnectionError
+
+import lp_metrics
+
+# Shared HTTP client for the Learning Passport scripts: one keep-alive connection pool per instance,
+# compressed transfers, timeouts on every request and retries with jittered backoff.
+
+DEFAULT_TIMEOUT = (10, 120)  # Seconds to connect, seconds between bytes received
+DEFAULT_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A POST may have been processed before a timeout or 5xx, so it is only retried when it was never sent
+# or the server turned it away with 429
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UNSENT_RETRY_STATUSES = {429}
+
+class RateLimiter:
+    """Spaces request starts so that at most `rate` requests per second go out across all workers."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def request_not_sent(error):
+    # Connection refused, name resolution and connect timeouts fail before any of the request is sent
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+class LPClient:
+    """Client for one Learning Passport instance, safe to share between threads."""
+
+    def __init__(self, instance_url, token, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=1.0, max_backoff=60.0, pool_size=10, rate_limit=0):
+        self.instance_url = instance_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = RateLimiter(rate_limit)
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept-Encoding": DEFAULT_ACCEPT_ENCODING,  # gzip/deflate, plus br when brotli is installed
+        })
+
+    def url(self, path):
+        return f"{self.instance_url}/{path.lstrip('/')}"
+
+    def retry_delay(self, attempt, response=None):
+        # Honour Retry-After on 429/503, otherwise use exponential backoff with full jitter
+        if response is not None and response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after + random.uniform(0, self.backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, path, retries=None, **kwargs):
+        """Send a request, retrying connection errors and 429/5xx responses; returns the last response.
+        Non-idempotent methods are only retried after connect errors and 429."""
+        retries = self.retries if retries is None else retries
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else UNSENT_RETRY_STATUSES
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        attempt = 0
+        while True:
+            self.rate_limiter.wait()
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                lp_metrics.metrics.record_request(method, path, "error", time.perf_counter() - start, retry=attempt > 0)
+                if attempt >= retries or not (idempotent or request_not_sent(e)):
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if lp_metrics.metrics.enabled:
+                    self.record_metrics(method, path, response, time.perf_counter() - start, attempt > 0,
+                                        kwargs.get("stream", False))
+                if response.status_code not in retry_statuses or attempt >= retries:
+                    return response
+                delay = self.retry_delay(attempt, response)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def record_metrics(self, method, path, response, elapsed, retry, stream=False):
+        # Response size from Content-Length; without it, a non-streamed body was already read and can be
+        # measured, while a streamed one is read later by the caller and its size is recorded as unknown
+        body = response.request.body
+        bytes_out = len(body) if isinstance(body, (bytes, str)) else 0
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit():
+            bytes_in = int(content_length)
+        elif not stream:
+            bytes_in = len(response.content)
+        else:
+            bytes_in = None
+        lp_metrics.metrics.record_request(method, path, response.status_code, elapsed,
+                                          response.elapsed.total_seconds(), bytes_out, bytes_in, retry)
+
+    def connections_opened(self):
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        if lp_metrics.metrics.enabled:
+            lp_metrics.metrics.record_connections(self.connections_opened())
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,34 +1,52 @@
-import requests
-import sys
+import argparse
+from lp_api_client import LPClient
+from lp_mirror import Mirror
+from lp_json_stream import count_json_array
 
-def get_number_of_groups(instance_url, access_token):
-    # Construct the API URL
-    api_url = f"{instance_url.rstrip('/')}/api/v1/Groups"
+CHUNK_SIZE = 64 * 1024
 
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
+def get_number_of_groups(instance_url, access_token):
+    client = LPClient(instance_url, access_token)
 
     try:
-        # Make the GET request
-        response = requests.get(api_url, headers=headers)
+        # Make the GET request, reading the body as it arrives
+        response = client.get("/api/v1/Groups", stream=True)
         
         # Check if the request was successful
         if response.status_code == 200:
-            data = response.json()  # Parse the JSON response
-            number_of_groups = len(data)  # Get the number of groups
+            # Count the groups without keeping them in memory
+            number_of_groups = count_json_array(response.iter_content(chunk_size=CHUNK_SIZE))
             print(f"Number of groups: {number_of_groups}")
         else:
             print(f"Failed to fetch groups. Status code: {response.status_code}, Response: {response.text}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        client.close()
+
+def get_number_of_groups_from_mirror(instance_url, mirror_path):
+    # Count the groups in the local mirror (see lp_mirror.py) without calling the API
+    mirror = Mirror(mirror_path)
+    try:
+        if mirror.has_groups(instance_url):
+            print(f"Number of groups: {mirror.count_groups(instance_url)}")
+        else:
+            print(f"The mirror has no groups for {instance_url}; run 'python lp_mirror.py {mirror_path} refresh' first.")
+    finally:
+        mirror.close()
 
 if __name__ == "__main__":
     # Get arguments from the command line
-    if len(sys.argv) != 3:
-        print("Usage: python get_groups.py <INSTANCE_URL> <ACCESS_TOKEN>")
+    parser = argparse.ArgumentParser(description="Print the number of groups of a Learning Passport instance.")
+    parser.add_argument("instance_url", help="Base URL of the Learning Passport instance")
+    parser.add_argument("access_token", nargs="?", help="API access token (not needed with --mirror)")
+    parser.add_argument("--mirror", metavar="DB", help="Count the groups in this local mirror instead of calling the API")
+    args = parser.parse_args()
+
+    if args.mirror:
+        get_number_of_groups_from_mirror(args.instance_url, args.mirror)
+    elif not args.access_token:
+        parser.error("access_token is required unless --mirror is given")
     else:
-        instance_url = sys.argv[1]
-        access_token = sys.argv[2]
-        get_number_of_groups(instance_url, access_token)
+        get_number_of_groups(args.instance_url, args.access_token)
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+import requests
+
+# On-disk cache of GET response bodies for the Learning Passport scripts. Each entry keeps the
+# ETag/Last-Modified validators of its response, so later runs send a conditional request and
+# reuse the stored body when the server answers 304 Not Modified.
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+INDEX_NAME = "index.json"
+
+class CachedBody:
+    """A 200 response body stored in the cache, read back from disk."""
+
+    status_code = 200
+
+    def __init__(self, path, from_cache):
+        self.path = path
+        self.from_cache = from_cache
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        with open(self.path, "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+
+    def json(self):
+        with open(self.path, "rb") as file:
+            return json.load(file)
+
+    @property
+    def text(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+class ResponseCache:
+    """Size-bounded LRU cache of response bodies keyed by full request URL (instance, endpoint and query)."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_NAME)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as file:
+                    self.index = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring unreadable cache index '{self.index_path}': {e}")
+
+    def body_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    def get(self, client, path, params=None, headers=None):
+        """GET through the client, revalidating a cached body; returns a CachedBody or the failed response."""
+        url = requests.Request("GET", client.url(path), params=params).prepare().url
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        body_path = self.body_path(key)
+        headers = dict(headers or {})
+
+        with self.lock:
+            entry = self.index.get(key)
+        if entry and os.path.exists(body_path):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        else:
+            entry = None
+
+        response = client.get(path, params=params, headers=headers, stream=True)
+        if response.status_code == 304 and entry:
+            response.close()
+            with self.lock:
+                entry["last_used"] = time.time()
+                self.save_index()
+            return CachedBody(body_path, from_cache=True)
+        if response.status_code != 200:
+            return response
+
+        # Stream the new body to a temporary file so a failed download never replaces a good entry
+        temp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with open(temp_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+                    size += len(chunk)
+            os.replace(temp_path, body_path)
+        finally:
+            response.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with self.lock:
+            self.index[key] = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": size,
+                "last_used": time.time(),
+            }
+            self.evict(keep=key)
+            self.save_index()
+        return CachedBody(body_path, from_cache=False)
+
+    def evict(self, keep):
+        # Drop least recently used bodies until the cache fits in max_bytes
+        total = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda key: self.index[key]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.index.pop(key)["size"]
+            if os.path.exists(self.body_path(key)):
+                os.remove(self.body_path(key))
+
+    def save_index(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=2)
+        os.replace(temp_path, self.index_path)
@@ -0,0 +1,80 @@
+import codecs
+import json
+
+# Incremental parsing of large top-level JSON arrays, such as the /api/v1/Groups response,
+# so that only one element is held in memory at a time.
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+def iter_json_array(chunks):
+    """Yield each element of a top-level JSON array read from an iterable of byte chunks."""
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+    state = "start"
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        # Drop the consumed prefix before appending, so the buffer stays about one chunk long
+        buffer = buffer[pos:]
+        pos = 0
+        for chunk in chunks:
+            if chunk:
+                buffer += text_decoder.decode(chunk)
+                return True
+        buffer += text_decoder.decode(b"", final=True)
+        eof = True
+        return False
+
+    while True:
+        # Skip whitespace between tokens, reading more input as needed
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON input")
+            read_more()
+            continue
+
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise ValueError(f"Expected a JSON array, got {char!r}")
+            pos += 1
+            state = "first"
+        elif state in ("first", "value"):
+            if state == "first" and char == "]":
+                return
+            try:
+                element, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # A number or literal cut off by the chunk boundary may continue in the next chunk
+            if char not in '{["' and not eof and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+                read_more()
+                continue
+            pos = end
+            state = "separator"
+            yield element
+        else:
+            if char == ",":
+                state = "value"
+            elif char == "]":
+                return
+            else:
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+            pos += 1
+
+def count_json_array(chunks):
+    """Count the elements of a top-level JSON array without keeping them in memory."""
+    count = 0
+    for _ in iter_json_array(chunks):
+        count += 1
+    return count
@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Optional run metrics for the Learning Passport scripts: per-request latency histograms, bytes,
+# status codes and retries (recorded by LPClient), plus per-stage timings recorded by the scripts.
+# Nothing is recorded until enable() is called; until then `metrics` is a no-op recorder.
+# Reports are written as JSON and as a Prometheus textfile for node_exporter's textfile collector.
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ID_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+def endpoint_of(path):
+    # Group requests by endpoint rather than by URL: /api/v1/Groups/123/Courses -> /api/v1/Groups/{id}/Courses
+    return ID_PATTERN.sub("/{id}", "/" + path.split("?", 1)[0].lstrip("/"))
+
+class NoOpStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NO_OP_STAGE = NoOpStage()
+
+class NullMetrics:
+    """Recorder used while metrics are disabled; every call returns immediately."""
+
+    enabled = False
+
+    def record_request(self, method, path, status, elapsed, time_to_headers=0.0, bytes_out=0, bytes_in=0, retry=False):
+        pass
+
+    def record_connections(self, count):
+        pass
+
+    def stage(self, name):
+        return NO_OP_STAGE
+
+class Metrics:
+    """Thread-safe recorder of request and stage metrics for one run."""
+
+    enabled = True
+
+    def __init__(self, script=None):
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.stages = {}
+        self.connections = 0
+
+    def record_request(self, method, path, status, elapsed, time_to_headers=0.0, bytes_out=0, bytes_in=0, retry=False):
+        """Record one attempt; status is the HTTP status code or 'error' for a connection error or timeout.
+        bytes_in is None when the response size is unknown (a streamed body without Content-Length)."""
+        key = (method, endpoint_of(path))
+        with self.lock:
+            entry = self.endpoints.get(key)
+            if entry is None:
+                entry = self.endpoints[key] = {
+                    "count": 0, "seconds": 0.0, "time_to_headers_seconds": 0.0, "retries": 0,
+                    "bytes_out": 0, "bytes_in": 0, "bytes_in_unknown": 0, "statuses": {},
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                }
+            entry["count"] += 1
+            entry["seconds"] += elapsed
+            entry["time_to_headers_seconds"] += time_to_headers
+            entry["bytes_out"] += bytes_out
+            if bytes_in is None:
+                entry["bytes_in_unknown"] += 1
+            else:
+                entry["bytes_in"] += bytes_in
+            entry["retries"] += retry
+            entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    entry["buckets"][index] += 1
+                    break
+
+    def record_connections(self, count):
+        # Connections opened by a client over its lifetime; each one paid for DNS, TCP and TLS setup
+        with self.lock:
+            self.connections += count
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the run (fetch, parse, transform, write, ...); repeated stages add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                entry = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+                entry["count"] += 1
+                entry["seconds"] += elapsed
+
+    def report(self):
+        with self.lock:
+            endpoints = []
+            for (method, endpoint), entry in sorted(self.endpoints.items()):
+                endpoints.append(dict(entry, method=method, endpoint=endpoint,
+                                      statuses=dict(entry["statuses"]), buckets=list(entry["buckets"])))
+            return {
+                "script": self.script,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "connections_opened": self.connections,
+                "latency_buckets": list(LATENCY_BUCKETS),
+                "requests": endpoints,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+            }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_prometheus(self, path):
+        """Write the report in the Prometheus text format, replacing the file atomically."""
+        report = self.report()
+        script = report["script"]
+        lines = [
+            "# HELP lp_run_duration_seconds Wall time of the run.",
+            "# TYPE lp_run_duration_seconds gauge",
+            f'lp_run_duration_seconds{{script="{script}"}} {report["duration_seconds"]}',
+            "# HELP lp_run_timestamp_seconds When the run started.",
+            "# TYPE lp_run_timestamp_seconds gauge",
+            f'lp_run_timestamp_seconds{{script="{script}"}} {self.started:.0f}',
+            "# HELP lp_http_connections_opened_total Connections opened during the run.",
+            "# TYPE lp_http_connections_opened_total counter",
+            f'lp_http_connections_opened_total{{script="{script}"}} {report["connections_opened"]}',
+            "# HELP lp_http_request_duration_seconds Request latency per attempt, until the body was read or streaming began.",
+            "# TYPE lp_http_request_duration_seconds histogram",
+        ]
+        counters = {"requests": [], "retries": [], "headers": [], "bytes_out": [], "bytes_in": [], "bytes_in_unknown": []}
+        for entry in report["requests"]:
+            labels = f'script="{script}",method="{entry["method"]}",endpoint="{entry["endpoint"]}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+                cumulative += count
+                lines.append(f'lp_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'lp_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+            lines.append(f'lp_http_request_duration_seconds_sum{{{labels}}} {entry["seconds"]:.6f}')
+            lines.append(f'lp_http_request_duration_seconds_count{{{labels}}} {entry["count"]}')
+            for status, count in sorted(entry["statuses"].items()):
+                counters["requests"].append(f'lp_http_requests_total{{{labels},status="{status}"}} {count}')
+            counters["retries"].append(f'lp_http_retries_total{{{labels}}} {entry["retries"]}')
+            counters["headers"].append(f'lp_http_time_to_headers_seconds_total{{{labels}}} {entry["time_to_headers_seconds"]:.6f}')
+            counters["bytes_out"].append(f'lp_http_request_bytes_total{{{labels}}} {entry["bytes_out"]}')
+            counters["bytes_in"].append(f'lp_http_response_bytes_total{{{labels}}} {entry["bytes_in"]}')
+            counters["bytes_in_unknown"].append(f'lp_http_responses_size_unknown_total{{{labels}}} {entry["bytes_in_unknown"]}')
+
+        for name, help_text, key in (
+            ("lp_http_requests_total", "Request attempts by status code ('error' for connection errors and timeouts).", "requests"),
+            ("lp_http_retries_total", "Attempts that were retries of an earlier attempt.", "retries"),
+            ("lp_http_time_to_headers_seconds_total", "Total time until response headers arrived.", "headers"),
+            ("lp_http_request_bytes_total", "Request body bytes sent.", "bytes_out"),
+            ("lp_http_response_bytes_total", "Response body bytes received (Content-Length, or the decoded body without it).", "bytes_in"),
+            ("lp_http_responses_size_unknown_total", "Streamed responses without Content-Length, not counted in lp_http_response_bytes_total.", "bytes_in_unknown"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"] + counters[key]
+
+        # Time in a stage adds up over every time the stage is entered, so it is a counter like the totals above
+        lines += ["# HELP lp_stage_seconds_total Time spent in each stage of the run.",
+                  "# TYPE lp_stage_seconds_total counter"]
+        for stage, entry in report["stages"].items():
+            lines.append(f'lp_stage_seconds_total{{script="{script}",stage="{stage}"}} {entry["seconds"]:.6f}')
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+metrics = NullMetrics()
+
+def enable(script=None):
+    """Start recording; LPClient and the scripts record into lp_metrics.metrics from then on."""
+    global metrics
+    metrics = Metrics(script)
+    return metrics
+
+def add_arguments(parser):
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write a JSON report of request and stage metrics")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write the metrics as a Prometheus textfile (for node_exporter's textfile collector)")
+
+def enable_from_args(args):
+    if args.metrics_json or args.metrics_prom:
+        enable()
+
+def write_reports(args):
+    if not metrics.enabled:
+        return
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"Metrics report saved to {args.metrics_json}")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+        print(f"Prometheus metrics saved to {args.metrics_prom}")
@@ -0,0 +1,309 @@
+import sys
+import csv
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from lp_api_client import LPClient
+from lp_json_stream import iter_json_array
+
+# Local SQLite mirror of the groups, courses and group->course assignments of one or more
+# Learning Passport instances. Groups and courses are refreshed with conditional requests and
+# set-based upserts, so an unchanged list costs one 304 and a changed one only touches the rows
+# that differ. Assignments are fetched per group, by default only for groups not fetched before.
+
+CHUNK_SIZE = 64 * 1024
+ASSIGNMENT_BATCH_SIZE = 1000  # Groups whose assignments are fetched and committed together
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    instance TEXT NOT NULL,
+    group_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    assignments_synced_at REAL,
+    PRIMARY KEY (instance, group_id)
+);
+CREATE INDEX IF NOT EXISTS groups_by_name ON groups (instance, name);
+CREATE TABLE IF NOT EXISTS courses (
+    instance TEXT NOT NULL,
+    course_id TEXT NOT NULL,
+    category_id TEXT,
+    parent_course_id TEXT,
+    language TEXT,
+    name TEXT,
+    PRIMARY KEY (instance, course_id)
+);
+CREATE TABLE IF NOT EXISTS group_courses (
+    instance TEXT NOT NULL,
+    group_id TEXT NOT NULL,
+    course_id TEXT NOT NULL,
+    PRIMARY KEY (instance, group_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS group_courses_by_course ON group_courses (instance, course_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    instance TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    refreshed_at REAL,
+    PRIMARY KEY (instance, endpoint)
+);
+"""
+
+def instance_key(instance_url):
+    return instance_url.rstrip("/")
+
+def as_text(value):
+    # IDs are stored as text; missing values stay NULL
+    return None if value is None else str(value)
+
+def course_id_of(item):
+    # The Courses endpoint of a group returns course objects; accept either ID field name
+    return str(item.get("CourseId", item.get("Id")))
+
+class Mirror:
+    """SQLite mirror of Learning Passport instances; use from one thread."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def conditional_get(self, client, endpoint, params=None):
+        """GET an endpoint with the validators of the last refresh; returns the response, or None if unchanged."""
+        instance = instance_key(client.instance_url)
+        headers = {"Accept": "application/json"}
+        row = self.db.execute("SELECT etag, last_modified FROM sync_state WHERE instance = ? AND endpoint = ?",
+                              (instance, endpoint)).fetchone()
+        if row:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+        response = client.get(endpoint, params=params, headers=headers, stream=True)
+        if response.status_code == 304 and row:
+            response.close()
+            return None
+        response.raise_for_status()
+        return response
+
+    def save_sync_state(self, instance, endpoint, response):
+        self.db.execute(
+            "INSERT OR REPLACE INTO sync_state (instance, endpoint, etag, last_modified, refreshed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (instance, endpoint, response.headers.get("ETag"), response.headers.get("Last-Modified"), time.time()))
+
+    def merge_rows(self, table, key_column, columns, instance, rows):
+        """Make `table` hold exactly `rows` for the instance; returns (added, updated, removed)."""
+        all_columns = [key_column] + columns
+        self.db.execute("DROP TABLE IF EXISTS temp.incoming")
+        self.db.execute(f"CREATE TEMP TABLE incoming ({', '.join(all_columns)}, PRIMARY KEY ({key_column}))")
+        self.db.executemany(f"INSERT OR REPLACE INTO temp.incoming VALUES ({', '.join('?' * len(all_columns))})", rows)
+
+        removed = self.db.execute(
+            f"DELETE FROM {table} WHERE instance = ? AND {key_column} NOT IN (SELECT {key_column} FROM temp.incoming)",
+            (instance,)).rowcount
+        differs = " OR ".join(f"t.{column} IS NOT i.{column}" for column in columns)
+        updated = self.db.execute(
+            f"UPDATE {table} AS t SET {', '.join(f'{column} = i.{column}' for column in columns)} "
+            f"FROM temp.incoming AS i WHERE t.instance = ? AND t.{key_column} = i.{key_column} AND ({differs})",
+            (instance,)).rowcount
+        added = self.db.execute(
+            f"INSERT INTO {table} (instance, {', '.join(all_columns)}) "
+            f"SELECT ?, {', '.join(all_columns)} FROM temp.incoming AS i "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE t.instance = ? AND t.{key_column} = i.{key_column})",
+            (instance, instance)).rowcount
+        self.db.execute("DROP TABLE temp.incoming")
+        return added, updated, removed
+
+    def refresh_groups(self, client):
+        """Refresh the groups of the client's instance; returns (added, updated, removed) or None if unchanged."""
+        instance = instance_key(client.instance_url)
+        response = self.conditional_get(client, "/api/v1/Groups")
+        if response is None:
+            return None
+        try:
+            rows = ((str(group.get("GroupId")), group.get("GroupName") or "")
+                    for group in iter_json_array(response.iter_content(chunk_size=CHUNK_SIZE)))
+            with self.db:
+                changes = self.merge_rows("groups", "group_id", ["name"], instance, rows)
+                # Assignments of deleted groups go with them
+                self.db.execute("DELETE FROM group_courses WHERE instance = ? AND group_id NOT IN "
+                                "(SELECT group_id FROM groups WHERE instance = ?)", (instance, instance))
+                self.save_sync_state(instance, "/api/v1/Groups", response)
+        finally:
+            response.close()
+        return changes
+
+    def refresh_courses(self, client):
+        """Refresh the published courses of the client's instance; returns (added, updated, removed) or None."""
+        instance = instance_key(client.instance_url)
+        endpoint = "/api/v3/admin/categoriesAndCourses"
+        response = self.conditional_get(client, endpoint, params={"publishedCourses": "true"})
+        if response is None:
+            return None
+        try:
+            data = response.json()
+        finally:
+            response.close()
+        rows = ((str(course["Id"]), as_text(course.get("ParentId")), as_text(course.get("ParentCourseId")),
+                 course.get("ContentLanguage"), course.get("Name"))
+                for course in data.get("CourseItems", []))
+        with self.db:
+            changes = self.merge_rows("courses", "course_id",
+                                      ["category_id", "parent_course_id", "language", "name"], instance, rows)
+            self.save_sync_state(instance, endpoint, response)
+        return changes
+
+    def refresh_assignments(self, client, group_ids=None, workers=1):
+        """Fetch the courses of the given groups (default: groups never fetched); returns the number of groups."""
+        instance = instance_key(client.instance_url)
+        if group_ids is None:
+            group_ids = [row[0] for row in self.db.execute(
+                "SELECT group_id FROM groups WHERE instance = ? AND assignments_synced_at IS NULL", (instance,))]
+
+        def fetch(group_id):
+            response = client.get(f"/api/v1/Groups/{group_id}/Courses")
+            response.raise_for_status()
+            return group_id, [course_id_of(item) for item in response.json()]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(group_ids), ASSIGNMENT_BATCH_SIZE):
+                batch = group_ids[start:start + ASSIGNMENT_BATCH_SIZE]
+                results = list(executor.map(fetch, batch))
+                with self.db:
+                    for group_id, course_ids in results:
+                        self.replace_assignments(instance, group_id, course_ids)
+                print(f"Assignments fetched for {start + len(batch)}/{len(group_ids)} groups")
+        return len(group_ids)
+
+    def replace_assignments(self, instance_url, group_id, course_ids, group_name=""):
+        """Store the full set of a group's courses and mark its assignments as fetched."""
+        instance = instance_key(instance_url)
+        group_id = str(group_id)
+        self.db.execute("DELETE FROM group_courses WHERE instance = ? AND group_id = ?", (instance, group_id))
+        self.db.executemany("INSERT OR IGNORE INTO group_courses VALUES (?, ?, ?)",
+                            ((instance, group_id, str(course_id)) for course_id in course_ids))
+        # The groups may never have been refreshed into this mirror; the next refresh fills in the rest
+        self.db.execute("INSERT OR IGNORE INTO groups (instance, group_id, name) VALUES (?, ?, ?)",
+                        (instance, group_id, group_name or ""))
+        self.db.execute("UPDATE groups SET assignments_synced_at = ? WHERE instance = ? AND group_id = ?",
+                        (time.time(), instance, group_id))
+
+    def record_assignments(self, instance_url, group_id, course_ids):
+        # Write through assignments made by another script; call commit() to save them
+        self.db.executemany("INSERT OR IGNORE INTO group_courses VALUES (?, ?, ?)",
+                            ((instance_key(instance_url), str(group_id), str(course_id)) for course_id in course_ids))
+
+    def known_group_courses(self, instance_url, group_id):
+        """Return the set of course IDs assigned to a group, or None if its assignments were never fetched."""
+        instance = instance_key(instance_url)
+        row = self.db.execute("SELECT assignments_synced_at FROM groups WHERE instance = ? AND group_id = ?",
+                              (instance, str(group_id))).fetchone()
+        if not row or row[0] is None:
+            return None
+        return {course_id for (course_id,) in self.db.execute(
+            "SELECT course_id FROM group_courses WHERE instance = ? AND group_id = ?", (instance, str(group_id)))}
+
+    def has_groups(self, instance_url):
+        return self.db.execute("SELECT 1 FROM sync_state WHERE instance = ? AND endpoint = '/api/v1/Groups'",
+                               (instance_key(instance_url),)).fetchone() is not None
+
+    def count_groups(self, instance_url):
+        return self.db.execute("SELECT COUNT(*) FROM groups WHERE instance = ?",
+                               (instance_key(instance_url),)).fetchone()[0]
+
+    def iter_groups(self, instance_url):
+        """Yield (group ID, group name) in group ID order."""
+        return self.db.execute("SELECT group_id, name FROM groups WHERE instance = ? ORDER BY CAST(group_id AS INTEGER)",
+                               (instance_key(instance_url),))
+
+    def group_courses(self, instance_url, group_id):
+        return [row[0] for row in self.db.execute(
+            "SELECT course_id FROM group_courses WHERE instance = ? AND group_id = ? ORDER BY CAST(course_id AS INTEGER)",
+            (instance_key(instance_url), str(group_id)))]
+
+    def course_groups(self, instance_url, course_id):
+        return [row[0] for row in self.db.execute(
+            "SELECT group_id FROM group_courses WHERE instance = ? AND course_id = ? ORDER BY CAST(group_id AS INTEGER)",
+            (instance_key(instance_url), str(course_id)))]
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+def export_groups_csv(mirror, instance_url, output_file):
+    # Same columns as the CSV written by retrieve_all_groups.py
+    with open(output_file, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Group ID", "Group Name"])
+        writer.writerows(mirror.iter_groups(instance_url))
+
+def describe_changes(name, changes):
+    if changes is None:
+        return f"{name}: not modified since the last refresh"
+    added, updated, removed = changes
+    return f"{name}: {added} added, {updated} updated, {removed} removed"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query a local SQLite mirror of Learning Passport instances.")
+    parser.add_argument("db_path", help="SQLite database file (created if missing)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = subparsers.add_parser("refresh", help="Refresh groups, courses and assignments from the API")
+    refresh_parser.add_argument("instance_url", help="Base URL of the Learning Passport instance")
+    refresh_parser.add_argument("token", help="API access token")
+    refresh_parser.add_argument("--assignments", choices=["new", "all", "none"], default="new",
+                                help="Fetch the courses of new groups only, of all groups, or of none (default: new)")
+    refresh_parser.add_argument("--workers", type=int, default=4,
+                                help="Concurrent requests when fetching assignments (default: 4)")
+
+    count_parser = subparsers.add_parser("count", help="Print the number of groups")
+    count_parser.add_argument("instance_url")
+    export_parser = subparsers.add_parser("export-groups", help="Write the groups to a CSV file")
+    export_parser.add_argument("instance_url")
+    export_parser.add_argument("output_file")
+    group_parser = subparsers.add_parser("group-courses", help="List the courses assigned to a group")
+    group_parser.add_argument("instance_url")
+    group_parser.add_argument("group_id")
+    course_parser = subparsers.add_parser("course-groups", help="List the groups a course is assigned to")
+    course_parser.add_argument("instance_url")
+    course_parser.add_argument("course_id")
+    args = parser.parse_args()
+
+    mirror = Mirror(args.db_path)
+    try:
+        if args.command == "refresh":
+            if args.workers < 1:
+                parser.error("--workers must be at least 1")
+            with LPClient(args.instance_url, args.token, pool_size=args.workers) as client:
+                print(describe_changes("Groups", mirror.refresh_groups(client)))
+                print(describe_changes("Courses", mirror.refresh_courses(client)))
+                if args.assignments != "none":
+                    group_ids = None
+                    if args.assignments == "all":
+                        group_ids = [group_id for group_id, _ in mirror.iter_groups(args.instance_url)]
+                    fetched = mirror.refresh_assignments(client, group_ids, workers=args.workers)
+                    print(f"Assignments refreshed for {fetched} groups")
+        elif args.command == "count":
+            print(f"Number of groups: {mirror.count_groups(args.instance_url)}")
+        elif args.command == "export-groups":
+            export_groups_csv(mirror, args.instance_url, args.output_file)
+            print(f"Groups saved successfully to {args.output_file}")
+        elif args.command == "group-courses":
+            print("\n".join(mirror.group_courses(args.instance_url, args.group_id)))
+        else:
+            print("\n".join(mirror.course_groups(args.instance_url, args.course_id)))
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching data: {e}")
+        sys.exit(1)
+    finally:
+        mirror.close()
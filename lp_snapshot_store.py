@@ -0,0 +1,214 @@
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+# Compact history of course catalog fetches for one instance. The first run (and every
+# REBASE_EVERY-th run after it) is stored as a full base; the others only store the records that
+# were added, changed or removed since the previous run. Each run is a gzip file of JSON lines,
+# and index.json lists the runs with their change counts so history can be listed without
+# opening any of them.
+
+INDEX_NAME = "index.json"
+DIGESTS_NAME = "digests.json.gz"
+REBASE_EVERY = 100  # Delta runs written before the next full base
+
+def record_key(kind, record):
+    # Categories are keyed by Id, courses by CourseID
+    return f"category:{record['Id']}" if kind == "category" else f"course:{record['CourseID']}"
+
+def record_digest(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class SnapshotStore:
+    """Base + delta snapshot history stored in one directory per instance."""
+
+    def __init__(self, store_dir, rebase_every=REBASE_EVERY):
+        self.store_dir = store_dir
+        self.rebase_every = rebase_every
+        os.makedirs(store_dir, exist_ok=True)
+        self.index_path = os.path.join(store_dir, INDEX_NAME)
+        self.index = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self.index = json.load(file)
+
+    def run_path(self, entry):
+        return os.path.join(self.store_dir, entry["file"])
+
+    def load_digests(self):
+        # Digest of every record in the latest run, so a new run can be diffed without replaying history
+        path = os.path.join(self.store_dir, DIGESTS_NAME)
+        if not self.index or not os.path.exists(path):
+            return {}
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            return json.load(file)
+
+    def write(self, categories, courses, timestamp=None):
+        """Stream one run's categories and courses into the store; returns its index entry."""
+        timestamp = timestamp or datetime.now()
+        previous = self.load_digests()
+        runs_since_base = 0
+        for entry in reversed(self.index):
+            if entry["base"]:
+                break
+            runs_since_base += 1
+        base = not self.index or not previous or runs_since_base >= self.rebase_every
+
+        run = self.index[-1]["run"] + 1 if self.index else 1
+        file_name = f"run_{run:06d}_{'base' if base else 'delta'}.jsonl.gz"
+        temp_path = os.path.join(self.store_dir, f"{file_name}.tmp")
+        digests = {}
+        counts = {"category": 0, "course": 0, "added": 0, "changed": 0, "removed": 0}
+
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            for kind, records in (("category", categories), ("course", courses)):
+                for record in records:
+                    key = record_key(kind, record)
+                    digest = record_digest(record)
+                    digests[key] = digest
+                    counts[kind] += 1
+                    if key not in previous:
+                        change = "added"
+                    elif previous[key] != digest:
+                        change = "changed"
+                    else:
+                        change = "unchanged"
+                    if change != "unchanged":
+                        counts[change] += 1
+                    # A base keeps every record; a delta only the ones that differ from the previous run
+                    if base or change != "unchanged":
+                        file.write(json.dumps({"op": "set", "key": key, "change": change, "record": record},
+                                              ensure_ascii=False) + "\n")
+            for key in previous:
+                if key not in digests:
+                    counts["removed"] += 1
+                    file.write(json.dumps({"op": "del", "key": key, "change": "removed"}) + "\n")
+        os.replace(temp_path, os.path.join(self.store_dir, file_name))
+
+        digests_path = os.path.join(self.store_dir, DIGESTS_NAME)
+        with gzip.open(f"{digests_path}.tmp", "wt", encoding="utf-8") as file:
+            json.dump(digests, file)
+        os.replace(f"{digests_path}.tmp", digests_path)
+
+        entry = {
+            "run": run,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "file": file_name,
+            "base": base,
+            "categories": counts["category"],
+            "courses": counts["course"],
+            "added": counts["added"],
+            "changed": counts["changed"],
+            "removed": counts["removed"],
+        }
+        self.index.append(entry)
+        with open(f"{self.index_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=2)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        return entry
+
+    def find_run(self, run_or_time):
+        """Return the entry for a run number, or the latest run at or before a 'YYYY-mm-dd[ HH:MM:SS]' time."""
+        if str(run_or_time).isdecimal():
+            for entry in self.index:
+                if entry["run"] == int(run_or_time):
+                    return entry
+            raise ValueError(f"no run {run_or_time}")
+        found = None
+        for entry in self.index:
+            if entry["timestamp"] <= run_or_time or entry["timestamp"].startswith(run_or_time):
+                found = entry
+        if not found:
+            raise ValueError(f"no run at or before {run_or_time}")
+        return found
+
+    def iter_ops(self, entry):
+        with gzip.open(self.run_path(entry), "rt", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line)
+
+    def state_at(self, entry):
+        """Rebuild the records of a run from the nearest base before it and the deltas after that."""
+        position = self.index.index(entry)
+        start = position
+        while not self.index[start]["base"]:
+            start -= 1
+        state = {}
+        for run_entry in self.index[start:position + 1]:
+            for op in self.iter_ops(run_entry):
+                if op["op"] == "set":
+                    state[op["key"]] = op["record"]
+                elif not run_entry["base"]:
+                    state.pop(op["key"], None)
+        return state
+
+    def changes_between(self, entry_a, entry_b):
+        """Return {key: (change, record)} for what changed from run A to run B, reading only the runs in between."""
+        first = {}
+        last = {}
+        for run_entry in self.index[self.index.index(entry_a) + 1:self.index.index(entry_b) + 1]:
+            for op in self.iter_ops(run_entry):
+                if op["change"] == "unchanged":
+                    continue
+                first.setdefault(op["key"], op["change"])
+                last[op["key"]] = op
+
+        changes = {}
+        for key, op in last.items():
+            existed_before = first[key] != "added"
+            exists_after = op["op"] == "set"
+            if existed_before and exists_after:
+                changes[key] = ("changed", op["record"])
+            elif exists_after:
+                changes[key] = ("added", op["record"])
+            elif existed_before:
+                changes[key] = ("removed", None)
+        return changes
+
+def write_catalog_json(file_path, state):
+    # Same layout as the files written by fetch_courses.py
+    catalog = {
+        "Categories": [record for key, record in state.items() if key.startswith("category:")],
+        "Courses": [record for key, record in state.items() if key.startswith("course:")],
+    }
+    with open(file_path, "w", encoding="utf-8") as file:
+        json.dump(catalog, file, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the course catalog snapshots of one instance.")
+    parser.add_argument("store_dir", help="Snapshot directory of the instance (<snapshot dir>/<domain>)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List the stored runs and their change counts")
+    show_parser = subparsers.add_parser("show", help="Rebuild the catalog of one run")
+    show_parser.add_argument("run", help="Run number, or a 'YYYY-mm-dd HH:MM:SS' time")
+    show_parser.add_argument("output_file", help="JSON file to write the catalog to")
+    diff_parser = subparsers.add_parser("diff", help="Show what changed between two runs")
+    diff_parser.add_argument("run_a", help="Earlier run number or time")
+    diff_parser.add_argument("run_b", help="Later run number or time")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store_dir)
+    try:
+        if args.command == "list":
+            for entry in store.index:
+                print(f"{entry['run']:>6}  {entry['timestamp']}  {'base ' if entry['base'] else 'delta'}  "
+                      f"{entry['categories']} categories, {entry['courses']} courses  "
+                      f"+{entry['added']} ~{entry['changed']} -{entry['removed']}")
+        elif args.command == "show":
+            entry = store.find_run(args.run)
+            write_catalog_json(args.output_file, store.state_at(entry))
+            print(f"Run {entry['run']} ({entry['timestamp']}) saved to {args.output_file}")
+        else:
+            entry_a, entry_b = store.find_run(args.run_a), store.find_run(args.run_b)
+            changes = store.changes_between(entry_a, entry_b)
+            for key, (change, record) in sorted(changes.items()):
+                name = record.get("Name", "") if record else ""
+                print(f"{change:<8} {key} {name}".rstrip())
+            print(f"{len(changes)} changes between run {entry_a['run']} and run {entry_b['run']}")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -1,30 +1,283 @@
 import re
 import os
+import sys
+import html
 import base64
+import hashlib
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+NUMBERED_HTML_PATTERN = re.compile(r'^\d+.*\.html$')
+
+# Cache of each file's encoded fragment, one subdirectory per lesson folder; used by batch mode
+CACHE_DIR_NAME = '.h5p-merge-cache'
+CACHE_INDEX_NAME = 'cache.json'
+CACHE_VERSION = 1
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Bytes encoded per write; a multiple of 3 so the base64 chunks concatenate without padding
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+# Inline <script>/<style> blocks at least this large are shared when several files contain them
+MIN_SHARED_ASSET_SIZE = 1024
+OPEN_TAG_PATTERN = re.compile(rb'<(script|style)\b([^>]*)>', re.IGNORECASE)
+CLOSE_TAG_PATTERNS = {
+    b'script': re.compile(rb'</script\s*>', re.IGNORECASE),
+    b'style': re.compile(rb'</style\s*>', re.IGNORECASE),
+}
+SRC_ATTRIBUTE_PATTERN = re.compile(rb'\bsrc\s*=', re.IGNORECASE)
+TYPE_ATTRIBUTE_PATTERN = re.compile(rb'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+SCRIPT_TYPES = {b'text/javascript', b'application/javascript', b'module'}
+
+# Characters escaped per write in lazy mode
+ESCAPE_CHUNK_SIZE = 1024 * 1024
+
+# Only emitted when blocks are actually shared; without it fragments are embedded exactly as before
+SHARED_ASSET_SCRIPT = """
+        // Shared script/style blocks are stored once in the page and loaded into each iframe from a blob URL
+        var h5pAssetUrls = {};
+        function h5pAssetUrl(assetId) {
+            if (!h5pAssetUrls[assetId]) {
+                var holder = document.getElementById('h5p-asset-' + assetId);
+                var type = holder.getAttribute('data-type') === 'style' ? 'text/css' : 'text/javascript';
+                h5pAssetUrls[assetId] = URL.createObjectURL(new Blob([holder.textContent], { type: type }));
+            }
+            return h5pAssetUrls[assetId];
+        }
+        function resolveSharedAssets(content) {
+            return content.replace(/h5p-asset:([0-9a-f]{20})/g, function(match, assetId) {
+                return h5pAssetUrl(assetId);
+            });
+        }"""
+
+# In lazy mode each fragment waits in a <textarea> until its block gets near the viewport
+LAZY_LOADER_SCRIPT = """
+        function materializeFragment(block) {
+            var holder = block.querySelector('textarea.h5p-fragment');
+            if (!holder) {
+                return;
+            }
+            var iframe = block.querySelector('iframe');
+            var content = resolveSharedAssets(holder.value);
+            holder.parentNode.removeChild(holder);
+            iframe.onload = function() {
+                resizeIframe(iframe);
+            };
+            var doc = iframe.contentWindow.document;
+            doc.open();
+            doc.write(content);
+            doc.close();
+        }
+        document.addEventListener('DOMContentLoaded', function() {
+            var blocks = Array.prototype.slice.call(document.querySelectorAll('.content-block.lazy'));
+            if (!('IntersectionObserver' in window)) {
+                blocks.forEach(materializeFragment);
+                return;
+            }
+            var observer = new IntersectionObserver(function(entries) {
+                entries.forEach(function(entry) {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        materializeFragment(entry.target);
+                    }
+                });
+            }, { rootMargin: '800px 0px' });
+            blocks.forEach(function(block) {
+                observer.observe(block);
+            });
+        });"""
 
 def update_margin_in_body(html_content):
     # Replace the margin style in the main div inside the body
-    return re.sub(r'(<div style=")margin: 20px 20px;', r'\1margin: 0;', html_content, flags=re.DOTALL)
+    return re.sub(rb'(<div style=")margin: 20px 20px;', rb'\1margin: 0;', html_content, flags=re.DOTALL)
+
+def write_base64(output_file, data):
+    # Encode and write in slices so only one slice of base64 text exists at a time
+    view = memoryview(data)
+    for start in range(0, len(view), ENCODE_CHUNK_SIZE):
+        output_file.write(base64.b64encode(view[start:start + ENCODE_CHUNK_SIZE]).decode('ascii'))
+
+def iter_inline_blocks(html_content):
+    # Yield (start, end, tag, attributes, body) for each <script> and <style> element
+    position = 0
+    while True:
+        open_match = OPEN_TAG_PATTERN.search(html_content, position)
+        if not open_match:
+            return
+        tag = open_match.group(1).lower()
+        close_match = CLOSE_TAG_PATTERNS[tag].search(html_content, open_match.end())
+        if not close_match:
+            return
+        yield (open_match.start(), close_match.end(), tag, open_match.group(2),
+               html_content[open_match.end():close_match.start()])
+        position = close_match.end()
+
+def find_shareable_blocks(html_content):
+    # Yield (block, asset id) for inline scripts and styles that can be loaded from a shared blob URL instead
+    for block in iter_inline_blocks(html_content):
+        _, _, tag, attributes, body = block
+        if len(body) < MIN_SHARED_ASSET_SIZE:
+            continue
+        if tag == b'script':
+            type_match = TYPE_ATTRIBUTE_PATTERN.search(attributes)
+            if SRC_ATTRIBUTE_PATTERN.search(attributes) or (type_match and type_match.group(1).lower() not in SCRIPT_TYPES):
+                continue
+        elif re.search(rb'</script', body, re.IGNORECASE):
+            # The shared copy is stored inside a <script> element, which this would close early
+            continue
+        try:
+            body.decode('utf-8')
+        except UnicodeDecodeError:
+            continue
+        yield block, hashlib.sha256(body).hexdigest()[:20]
+
+def scan_html_file(file_path, stat, entry, dedupe_assets):
+    # Content hash and shareable block IDs of a file, reusing the cache entry when the file wasn't touched
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry
+    with open(file_path, 'rb') as file:
+        html_content = file.read()
+    sha256 = hashlib.sha256(html_content).hexdigest()
+    if entry and entry['sha256'] == sha256:
+        # Touched but unchanged
+        return dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    asset_ids = [asset_id for _, asset_id in find_shareable_blocks(html_content)] if dedupe_assets else []
+    return {'sha256': sha256, 'asset_ids': asset_ids, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def load_merge_cache(cache_path):
+    # Anything unreadable or from another cache version just means a full rebuild
+    try:
+        with open(os.path.join(cache_path, CACHE_INDEX_NAME), 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
 
-def merge_html_files_in_directory(directory_path):
-    print(f"Looking for HTML files in directory: {directory_path}")
+def save_merge_cache(cache_path, cache):
+    temp_path = os.path.join(cache_path, CACHE_INDEX_NAME + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(cache, file)
+    os.replace(temp_path, os.path.join(cache_path, CACHE_INDEX_NAME))
+
+def output_unchanged(cache, output_path):
+    # index.html is still the file this cache wrote
+    if not os.path.exists(output_path):
+        return False
+    stat = os.stat(output_path)
+    return cache.get('output') == {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def fragment_name(sha256, used_asset_ids, lazy):
+    # The encoded fragment depends on the file, on which of its blocks are shared and on the mode
+    key = ' '.join([sha256, 'lazy' if lazy else 'inline', *used_asset_ids])
+    return hashlib.sha256(key.encode('ascii')).hexdigest()[:32] + '.fragment'
+
+def copy_text(source_path, output_file):
+    with open(source_path, 'r', encoding='utf-8', newline='') as source:
+        while chunk := source.read(COPY_CHUNK_SIZE):
+            output_file.write(chunk)
+
+def extract_shared_assets(html_content, shared_assets):
+    # Replace shared blocks with references to their blob URL; return the new content and the blocks used
+    parts = []
+    used_assets = []
+    position = 0
+    if not shared_assets:
+        return html_content, used_assets
+    for (start, end, tag, attributes, body), asset_id in find_shareable_blocks(html_content):
+        if asset_id not in shared_assets:
+            continue
+        if tag == b'script':
+            reference = b'<script' + attributes + b' src="h5p-asset:' + asset_id.encode() + b'"></script>'
+        else:
+            reference = b'<link rel="stylesheet"' + attributes + b' href="h5p-asset:' + asset_id.encode() + b'">'
+        parts.append(html_content[position:start])
+        parts.append(reference)
+        used_assets.append((asset_id, tag.decode(), body))
+        position = end
+    if not used_assets:
+        return html_content, used_assets
+    parts.append(html_content[position:])
+    return b''.join(parts), used_assets
+
+def write_escaped(output_file, data):
+    # Escape for a <textarea> in slices; the browser unescapes it when reading the textarea's value
+    text = data.decode('utf-8', errors='replace')
+    for start in range(0, len(text), ESCAPE_CHUNK_SIZE):
+        output_file.write(html.escape(text[start:start + ESCAPE_CHUNK_SIZE], quote=False))
+
+def merge_html_files_in_directory(directory_path, dedupe_assets=True, lazy=False, cache_path=None, verbose=True):
+    """Merge the numbered HTML files of directory_path into its index.html.
+
+    With cache_path, each file's encoded fragment is kept there and reused while the file is unchanged,
+    and index.html is left alone when no file changed. Returns True when index.html was written,
+    False when it was up to date and None when there was nothing to merge."""
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log(f"Looking for HTML files in directory: {directory_path}")
 
     # Extract directory name for title and header
     directory_name = os.path.basename(directory_path).replace('-', ' ')
 
     # Get all HTML files starting with a number in consecutive order
     html_files = sorted(
-        [f for f in os.listdir(directory_path) if re.match(r'^\d+.*\.html$', f)],
+        [f for f in os.listdir(directory_path) if NUMBERED_HTML_PATTERN.match(f)],
         key=lambda x: int(re.match(r'^(\d+)', x).group(1))
     )
 
     if not html_files:
-        print("No HTML files found that start with a number.")
-        return
+        log("No HTML files found that start with a number.")
+        return None
+
+    log(f"Found HTML files: {html_files}")
+
+    output_path = os.path.join(directory_path, 'index.html')
+    options = {'dedupe': dedupe_assets, 'lazy': lazy}
+    cache = load_merge_cache(cache_path) if cache_path else {}
+    if cache.get('options') != options:
+        cache = {}
+    cached_files = cache.get('files', {})
+    up_to_date = output_unchanged(cache, output_path)
+
+    # Nothing to do when no file was touched since index.html was written
+    stats = {html_file: os.stat(os.path.join(directory_path, html_file)) for html_file in html_files}
+    if up_to_date and list(cached_files) == html_files and all(
+            cached_files[html_file]['size'] == stats[html_file].st_size
+            and cached_files[html_file]['mtime_ns'] == stats[html_file].st_mtime_ns for html_file in html_files):
+        log(f"Up to date: {output_path}")
+        return False
 
-    print(f"Found HTML files: {html_files}")
+    files = {html_file: scan_html_file(os.path.join(directory_path, html_file), stats[html_file],
+                                       cached_files.get(html_file), dedupe_assets)
+             for html_file in html_files}
+    contents = [[html_file, files[html_file]['sha256']] for html_file in html_files]
+    if up_to_date and cache.get('contents') == contents:
+        # Only timestamps changed
+        cache['files'] = files
+        save_merge_cache(cache_path, cache)
+        log(f"Up to date: {output_path}")
+        return False
 
-    merged_html_content = f"""
+    # Blocks that appear in more than one file are stored once
+    files_per_asset = Counter()
+    for info in files.values():
+        files_per_asset.update(set(info['asset_ids']))
+    shared_assets = {asset_id for asset_id, file_count in files_per_asset.items() if file_count > 1}
+    if shared_assets:
+        log(f"Found {len(shared_assets)} inline script/style blocks shared between files")
+    if cache_path:
+        os.makedirs(cache_path, exist_ok=True)
+    asset_tags = cache.get('assets', {})
+
+    # Fragments only go through resolveSharedAssets when there is something to resolve
+    if shared_assets:
+        lazy_loader_script = LAZY_LOADER_SCRIPT
+        resolve_open, resolve_close = "resolveSharedAssets(", ")"
+    else:
+        lazy_loader_script = LAZY_LOADER_SCRIPT.replace("resolveSharedAssets(holder.value)", "holder.value")
+        resolve_open = resolve_close = ""
+
+    header = f"""
 <!DOCTYPE html>
 <html lang='fr'>
 <head>
@@ -68,64 +321,215 @@ def merge_html_files_in_directory(directory_path):
             padding-top:20px;
         }}
     </style>
-    <script>
+    <script>{SHARED_ASSET_SCRIPT if shared_assets else ""}
         function resizeIframe(iframe) {{
             iframe.style.height = (iframe.contentWindow.document.body.scrollHeight + 10) + 'px';
             setTimeout(function() {{
                 iframe.style.height = (iframe.contentWindow.document.body.scrollHeight + 10) + 'px';
             }}, 500);
-        }}
+        }}{lazy_loader_script if lazy else ""}
     </script>
 </head>
 <body>
     <h1 style="text-align:center;">{directory_name}</h1>
 """
 
-    # Read each HTML file and add to the merged content
-    for html_file in html_files:
-        print(f"Processing file: {html_file}")
-        with open(os.path.join(directory_path, html_file), 'r', encoding='utf-8') as file:
-            html_content = file.read()
-            updated_html_content = update_margin_in_body(html_content)
-            base64_content = base64.b64encode(updated_html_content.encode('utf-8')).decode('utf-8')
+    # Write the header first, then stream each file into the output before reading the next one.
+    # The output goes to a temporary file so a failed run leaves the previous index.html in place.
+    log(f"Writing merged content to: {output_path}")
+    temp_output_path = output_path + '.tmp'
+    emitted_assets = set()
+    saved_bytes = 0
+    encoded_count = 0
+    with open(temp_output_path, 'w', encoding='utf-8') as output_file:
+        output_file.write(header)
+
+        for html_file in html_files:
+            info = files[html_file]
+            used_asset_ids = [asset_id for asset_id in info['asset_ids'] if asset_id in shared_assets]
+            fragment = fragment_name(info['sha256'], used_asset_ids, lazy) if cache_path else None
+            reuse = (fragment is not None and info.get('fragment') == fragment
+                     and os.path.exists(os.path.join(cache_path, fragment))
+                     and all(asset_id in emitted_assets or (asset_id in asset_tags and os.path.exists(os.path.join(cache_path, f"asset-{asset_id}")))
+                             for asset_id in used_asset_ids))
+
+            if reuse:
+                log(f"Reusing cached file: {html_file}")
+                used_assets = [(asset_id, asset_tags.get(asset_id), None) for asset_id in used_asset_ids]
+            else:
+                log(f"Processing file: {html_file}")
+                encoded_count += 1
+                with open(os.path.join(directory_path, html_file), 'rb') as file:
+                    updated_html_content = update_margin_in_body(file.read())
+                updated_html_content, used_assets = extract_shared_assets(updated_html_content, shared_assets)
+
+            # Store each shared block once, the first time a file uses it
+            for asset_id, tag, body in used_assets:
+                asset_path = os.path.join(cache_path, f"asset-{asset_id}") if cache_path else None
+                if body is not None and cache_path:
+                    asset_tags[asset_id] = tag
+                    if not os.path.exists(asset_path):
+                        with open(asset_path, 'wb') as asset_file:
+                            asset_file.write(body)
+                if asset_id in emitted_assets:
+                    saved_bytes += len(body) if body is not None else os.path.getsize(asset_path)
+                    continue
+                emitted_assets.add(asset_id)
+                output_file.write(f"""
+    <script type="text/plain" id="h5p-asset-{asset_id}" data-type="{tag}">""")
+                if body is not None:
+                    output_file.write(body.decode('utf-8'))
+                else:
+                    copy_text(asset_path, output_file)
+                output_file.write("</script>")
+            del used_assets
             file_number = re.match(r'^(\d+)', html_file).group(1)
             file_name_without_number = re.sub(r'^\d+-', '', html_file).rsplit('.', 1)[0]
-            merged_html_content += f"""
+            if lazy:
+                output_file.write(f"""
+    <h2>{file_number}. {file_name_without_number}</h2>
+    <div class='content-block lazy' style="margin: 0;">
+        <iframe style="width: 100%; border: 0; height: 400px;"></iframe>
+        <textarea class="h5p-fragment" hidden>
+""")  # The parser drops one newline right after <textarea>, so the fragment's own first line survives
+                encode, closing = write_escaped, """</textarea>
+    </div>
+    """
+            else:
+                output_file.write(f"""
     <h2>{file_number}. {file_name_without_number}</h2>
     <div class='content-block' style="margin: 0;">
         <iframe onload="resizeIframe(this)" style="width: 100%; border: 0;"></iframe>
         <script>
             (function() {{
                 var iframe = document.currentScript.previousElementSibling;
-                var content = decodeURIComponent(escape(atob('{base64_content}')));
+                var content = {resolve_open}decodeURIComponent(escape(atob('""")
+                encode, closing = write_base64, "')))" + resolve_close + """;
                 var doc = iframe.contentWindow.document;
                 doc.open();
                 doc.write(content);
                 doc.close();
-            }})();
+            })();
         </script>
     </div>
     """
 
-    # Close the HTML structure
-    merged_html_content += """
+            if not reuse and cache_path:
+                # Encode once into the cache, then copy into the page
+                with open(os.path.join(cache_path, fragment), 'w', encoding='utf-8', newline='') as fragment_file:
+                    encode(fragment_file, updated_html_content)
+                info['fragment'] = fragment
+            if not reuse and not cache_path:
+                encode(output_file, updated_html_content)
+            else:
+                copy_text(os.path.join(cache_path, fragment), output_file)
+            output_file.write(closing)
+            if not reuse:
+                del updated_html_content
+
+        # Close the HTML structure
+        output_file.write("""
 </body>
 </html>
-"""
+""")
+    os.replace(temp_output_path, output_path)
 
-    # Write the merged HTML to the output file
-    output_path = os.path.join(directory_path, 'index.html')
-    print(f"Writing merged content to: {output_path}")
-    with open(output_path, 'w', encoding='utf-8') as output_file:
-        output_file.write(merged_html_content)
-    print("Merging complete.")
+    if cache_path:
+        # Drop fragments and shared blocks no file uses any more
+        keep = {CACHE_INDEX_NAME} | {info['fragment'] for info in files.values()}
+        keep |= {f"asset-{asset_id}" for asset_id in shared_assets}
+        for entry in os.scandir(cache_path):
+            if (entry.name.endswith('.fragment') or entry.name.startswith('asset-')) \
+                    and entry.name not in keep and entry.is_file(follow_symlinks=False):
+                os.remove(entry.path)
+        stat = os.stat(output_path)
+        save_merge_cache(cache_path, {
+            'version': CACHE_VERSION,
+            'options': options,
+            'files': files,
+            'contents': contents,
+            'assets': {asset_id: tag for asset_id, tag in asset_tags.items() if asset_id in shared_assets},
+            'output': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+        })
+        log(f"Re-encoded {encoded_count} of {len(html_files)} files")
+    if saved_bytes:
+        log(f"Shared blocks saved {saved_bytes / (1024 * 1024):.2f} MB before encoding")
+    log("Merging complete.")
+    return True
+
+def lesson_cache_path(cache_dir, folder_key):
+    # One flat directory per lesson, so the caches of nested lesson folders never overlap
+    return os.path.join(cache_dir, hashlib.sha256(folder_key.encode('utf-8')).hexdigest()[:16])
+
+def find_lesson_folders(root_path, cache_dir):
+    # Every folder under root_path (including itself) that contains numbered HTML files
+    for directory_path, directory_names, file_names in os.walk(root_path):
+        directory_names[:] = sorted(name for name in directory_names if not name.startswith('.')
+                                    and os.path.join(directory_path, name) != cache_dir)
+        if any(NUMBERED_HTML_PATTERN.match(name) for name in file_names):
+            yield directory_path
+
+def merge_all_lesson_folders(root_path, dedupe_assets=True, lazy=False, cache_dir=None, workers=None):
+    """Merge every lesson folder under root_path in a pool of processes, reusing cached fragments."""
+    cache_dir = cache_dir or os.path.join(root_path, CACHE_DIR_NAME)
+    folders = list(find_lesson_folders(root_path, cache_dir))
+    print(f"Found {len(folders)} lesson folders under {root_path}")
+
+    merged = up_to_date = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for folder in folders:
+            cache_path = lesson_cache_path(cache_dir, os.path.relpath(folder, root_path).replace(os.sep, '/'))
+            futures[executor.submit(merge_html_files_in_directory, folder, dedupe_assets, lazy,
+                                    cache_path, False)] = folder
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Error merging {folder}: {e}")
+                continue
+            if written:
+                merged += 1
+                print(f"Merged: {folder}")
+            else:
+                up_to_date += 1
+
+    print(f"Merged {merged} folders, {up_to_date} already up to date, {failed} failed.")
+    return failed == 0
 
 # Example usage
 # merge_html_files_in_directory('/path/to/your/directory')
 
+def main():
+    parser = argparse.ArgumentParser(description='Merge numbered H5P HTML files in a directory into a single index.html.')
+    parser.add_argument('directory_path',
+                        help='Directory containing the numbered HTML files (with --batch, the root of the lesson folders)')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help='Embed every file whole instead of sharing identical inline scripts and styles')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Only load each activity when it scrolls near the viewport')
+    parser.add_argument('--batch', action='store_true',
+                        help='Merge every folder under directory_path that contains numbered HTML files')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of folders merged at once with --batch (default: number of CPUs)')
+    parser.add_argument('--cache-dir', default=None,
+                        help=f'Where encoded fragments are cached (default with --batch: {CACHE_DIR_NAME} in the '
+                             'root directory; without --batch: no cache)')
+    args = parser.parse_args()
+
+    if args.batch:
+        if not merge_all_lesson_folders(args.directory_path, dedupe_assets=not args.no_dedupe, lazy=args.lazy,
+                                        cache_dir=args.cache_dir, workers=args.workers):
+            sys.exit(1)
+        return
+
+    cache_path = None
+    if args.cache_dir:
+        cache_path = lesson_cache_path(args.cache_dir, os.path.abspath(args.directory_path))
+    merge_html_files_in_directory(args.directory_path, dedupe_assets=not args.no_dedupe, lazy=args.lazy,
+                                  cache_path=cache_path)
+
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python merge_html_files.py <directory_path>")
-    else:
-        merge_html_files_in_directory(sys.argv[1])
+    main()
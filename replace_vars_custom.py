@@ -1,6 +1,10 @@
 import re
+import os
+import csv
 import sys
+import time
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 def parse_config(config_path):
     variables = {}
@@ -19,26 +23,160 @@ def parse_config(config_path):
             variables[name] = value
     return variables
 
-def replace_variables(input_path, output_path, variables):
+# Longest placeholder recognised, braces included; longer runs between {{ and }} are left as text
+MAX_PLACEHOLDER_LENGTH = 256
+# Matches {{name}} with optional whitespace inside the braces
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(?=[^{}]{0,%d}\}\})\s*([^{}]*?)\s*\}\}' % (MAX_PLACEHOLDER_LENGTH - 4))
+CHUNK_SIZE = 1024 * 1024
+
+def _unfinished_placeholder_start(buffer, position):
+    # Only a trailing '{', or '{{' followed by a short run without braces (and at most one '}'),
+    # may still become a placeholder once the next chunk arrives
+    start = buffer.rfind('{', position)
+    if start == -1:
+        return len(buffer)
+    if start > position and buffer[start - 1] == '{':
+        start -= 1
+    elif start < len(buffer) - 1:
+        return len(buffer)
+    close = buffer.find('}', start)
+    if close != -1 and close != len(buffer) - 1:
+        return len(buffer)
+    if len(buffer) - start >= MAX_PLACEHOLDER_LENGTH:
+        return len(buffer)
+    return start
+
+def iter_template_segments(file, chunk_size=CHUNK_SIZE):
+    """Yield literal text and (name, placeholder) pairs from a template file, reading it chunk by chunk."""
+    pending = ''
+    while True:
+        chunk = file.read(chunk_size)
+        buffer = pending + chunk
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(buffer):
+            if match.start() > position:
+                yield buffer[position:match.start()]
+            yield (match.group(1), match.group(0))
+            position = match.end()
+        if not chunk:
+            if position < len(buffer):
+                yield buffer[position:]
+            return
+        # Hold back a possible partial placeholder until the next chunk arrives
+        hold = _unfinished_placeholder_start(buffer, position)
+        if hold > position:
+            yield buffer[position:hold]
+        pending = buffer[hold:]
+
+def compile_template(input_path):
     with open(input_path, 'r') as f:
-        content = f.read()
+        return list(iter_template_segments(f))
+
+def render_segments(segments, variables, output_file):
+    # Each placeholder is looked up once; inserted values are never substituted again
+    write = output_file.write
+    for segment in segments:
+        if isinstance(segment, str):
+            write(segment)
+        else:
+            name, placeholder = segment
+            write(variables.get(name, placeholder))
+
+def replace_variables(input_path, output_path, variables):
+    # Stream the input through in a single pass, replacing each {{name}} found in the config
+    with open(input_path, 'r') as f, open(output_path, 'w') as out:
+        render_segments(iter_template_segments(f), variables, out)
+
+# Compiled templates per process, keyed by path and file version, so batch jobs parse each template once
+_template_cache = {}
 
-    # Replace all occurrences of each variable in the format {{name}}
-    for name, value in variables.items():
-        # Using f-strings to construct the regex pattern
-        pattern = rf'\{{\{{\s*{re.escape(name)}\s*\}}\}}'
-        content = re.sub(pattern, value, content)
+def get_compiled_template(template_path):
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), stat.st_mtime_ns, stat.st_size)
+    segments = _template_cache.get(key)
+    if segments is None:
+        segments = _template_cache[key] = compile_template(template_path)
+    return segments
 
-    with open(output_path, 'w') as f:
-        f.write(content)
+def render_job(job):
+    # Render one (template, config, output) triple; errors are returned so one bad config doesn't stop the batch
+    template_path, config_path, output_path = job
+    try:
+        variables = parse_config(config_path)
+        with open(output_path, 'w') as out:
+            render_segments(get_compiled_template(template_path), variables, out)
+        return output_path, None
+    except Exception as e:
+        return output_path, str(e)
+
+def read_manifest(manifest_path):
+    # Each row is template,config,output; blank lines, comments and a header row are skipped
+    jobs = []
+    with open(manifest_path, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#') or [cell.strip() for cell in row] == ['template', 'config', 'output']:
+                continue
+            if len(row) != 3:
+                print(f"Skipping invalid manifest row: {row}")
+                continue
+            jobs.append(tuple(cell.strip() for cell in row))
+    return jobs
+
+def render_batch(jobs, workers):
+    # Jobs for the same template are kept together so each worker compiles it once
+    jobs = sorted(jobs, key=lambda job: job[0])
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(render_job, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(render_job, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+
+    errors = []
+    for output_path, error in results:
+        if error:
+            errors.append((output_path, error))
+            print(f"Failed to render {output_path}: {error}")
+    if workers > 1:
+        executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    rate = f" ({len(jobs) / elapsed:.0f} files/s)" if elapsed > 0 else ""
+    print(f"Rendered {len(jobs) - len(errors)} of {len(jobs)} files in {elapsed:.2f}s{rate}")
+    return errors
 
 def main():
     parser = argparse.ArgumentParser(description='Replace variables in a text file based on a config file.')
-    parser.add_argument('config', help='Path to the config file')
-    parser.add_argument('input', help='Path to the input text file')
-    parser.add_argument('output', help='Path to the output text file')
+    parser.add_argument('config', nargs='?', help='Path to the config file')
+    parser.add_argument('input', nargs='?', help='Path to the input text file')
+    parser.add_argument('output', nargs='?', help='Path to the output text file')
+    batch = parser.add_argument_group('batch mode')
+    batch.add_argument('--template', help='Template rendered once per config given with --configs')
+    batch.add_argument('--configs', nargs='+', help='Config files to render the template with')
+    batch.add_argument('--output-dir', help='Directory for --configs outputs, named <config name><template extension>')
+    batch.add_argument('--manifest', help='CSV file of template,config,output rows to render')
+    batch.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='Number of worker processes for batch mode (default: number of CPUs)')
     args = parser.parse_args()
 
+    if args.manifest or args.template:
+        jobs = read_manifest(args.manifest) if args.manifest else []
+        if args.template:
+            if not args.configs or not args.output_dir:
+                parser.error('--template requires --configs and --output-dir')
+            extension = os.path.splitext(args.template)[1]
+            for config_path in args.configs:
+                config_name = os.path.splitext(os.path.basename(config_path))[0]
+                jobs.append((args.template, config_path, os.path.join(args.output_dir, config_name + extension)))
+        if args.workers < 1:
+            parser.error('--workers must be at least 1')
+        if render_batch(jobs, args.workers):
+            sys.exit(1)
+        return
+
+    if not (args.config and args.input and args.output):
+        parser.error('config, input and output are required unless --template or --manifest is given')
+
     variables = parse_config(args.config)
     replace_variables(args.input, args.output, variables)
     print(f"Replacements done. Output saved to {args.output}")
@@ -1,29 +1,51 @@
-import requests
 import csv
-import sys
 import os
+import argparse
 from datetime import datetime
+from lp_api_client import LPClient
+from lp_http_cache import ResponseCache, DEFAULT_MAX_BYTES
+from lp_json_stream import iter_json_array
+from lp_mirror import Mirror, export_groups_csv
 
-def retrieve_groups(instance_url, output_dir, token):
+CHUNK_SIZE = 64 * 1024
+
+def groups_output_file(instance_url, output_dir):
     # Extract the first subdomain for the filename
     subdomain = instance_url.split("//")[-1].split(".")[0]
     # Get current date and time
     current_time = datetime.now().strftime("%d-%m-%Y__%H-%M-%S")
     # Construct the output file name
-    output_file = os.path.join(output_dir, f"{subdomain}_all_groups_{current_time}.csv")
+    return os.path.join(output_dir, f"{subdomain}_all_groups_{current_time}.csv")
+
+def retrieve_groups_from_mirror(instance_url, output_dir, mirror_path):
+    # Export the groups held in the local mirror (see lp_mirror.py) without calling the API
+    output_file = groups_output_file(instance_url, output_dir)
+    mirror = Mirror(mirror_path)
+    try:
+        if not mirror.has_groups(instance_url):
+            print(f"The mirror has no groups for {instance_url}; run 'python lp_mirror.py {mirror_path} refresh' first.")
+            return
+        export_groups_csv(mirror, instance_url, output_file)
+        print(f"Groups saved successfully to {output_file}")
+    finally:
+        mirror.close()
+
+def retrieve_groups(instance_url, output_dir, token, cache=None):
+    output_file = groups_output_file(instance_url, output_dir)
 
-    url = f"{instance_url}/api/v1/Groups"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
+    client = LPClient(instance_url, token)
 
     try:
-        # Make the GET request
-        response = requests.get(url, headers=headers)
+        # Make the GET request, reading the body as it arrives; with a cache, an unchanged list isn't downloaded again
+        if cache:
+            response = cache.get(client, "/api/v1/Groups")
+        else:
+            response = client.get("/api/v1/Groups", stream=True)
 
         # Check if the request was successful
         if response.status_code == 200:
-            groups = response.json()  # Parse the JSON response
+            # Parse the JSON response one group at a time
+            groups = iter_json_array(response.iter_content(chunk_size=CHUNK_SIZE))
 
             # Write data to the CSV file
             with open(output_file, mode="w", newline="", encoding="utf-8") as file:
@@ -35,18 +57,34 @@ def retrieve_groups(instance_url, output_dir, token):
                 for group in groups:
                     writer.writerow([group.get("GroupId"), group.get("GroupName")])
 
+            if getattr(response, "from_cache", False):
+                print("Groups not modified since the last run; using the cached response.")
             print(f"Groups saved successfully to {output_file}")
         else:
             print(f"Failed to fetch groups. Status code: {response.status_code}, Response: {response.text}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        client.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python script.py <INSTANCE_URL> <OUTPUT_DIRECTORY> <TOKEN>")
+    parser = argparse.ArgumentParser(description="Save the ID and name of every group of a Learning Passport instance to a CSV file.")
+    parser.add_argument("instance_url", help="Base URL of the Learning Passport instance")
+    parser.add_argument("output_dir", help="Directory where the CSV file will be saved")
+    parser.add_argument("token", nargs="?", help="API access token (not needed with --mirror)")
+    parser.add_argument("--cache-dir", help="Cache responses here and only download them again when they change")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Maximum size of the response cache in MB (default: %(default)s)")
+    parser.add_argument("--mirror", metavar="DB",
+                        help="Export the groups from this local mirror (see lp_mirror.py) instead of calling the API")
+    args = parser.parse_args()
+
+    if not args.mirror and not args.token:
+        parser.error("token is required unless --mirror is given")
+
+    if args.mirror:
+        retrieve_groups_from_mirror(args.instance_url, args.output_dir, args.mirror)
     else:
-        instance_url = sys.argv[1]
-        output_dir = sys.argv[2]
-        token = sys.argv[3]
-        retrieve_groups(instance_url, output_dir, token)
+        cache = ResponseCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+        retrieve_groups(args.instance_url, args.output_dir, args.token, cache=cache)
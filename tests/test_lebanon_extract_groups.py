@@ -0,0 +1,70 @@
+import csv
+import os
+import sys
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LP Lebanon Madristi"))
+import lebanon_extract_groups
+
+def write_groups_csv(path, count):
+    # Group names follow the naming convention, with some quoted multi-line names and doubled quotes
+    rnd = random.Random(0)
+    with open(path, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Group ID", "Group Name"])
+        for group_id in range(1, count + 1):
+            name = f"{1000 + group_id}-{rnd.choice(['G1', 'G2', 'KG1', 'X9'])}-{rnd.choice(['EN', 'AR'])}-Section"
+            if group_id % 7 == 0:
+                name += '\nsecond line, with "quotes"\n'
+            writer.writerow([group_id, name])
+
+def sequential_classification(path):
+    matched = []
+    rejected = []
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            match = lebanon_extract_groups.classify_group_name(row["Group Name"])
+            if match:
+                matched.append([row["Group ID"], row["Group Name"], *match])
+            else:
+                rejected.append([row["Group ID"], row["Group Name"]])
+    return matched, rejected
+
+def read_rows(path):
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        return list(csv.reader(file))[1:]
+
+class ChunkedExtractionTest(unittest.TestCase):
+    def test_chunks_end_at_record_boundaries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = os.path.join(directory, "groups.csv")
+            write_groups_csv(input_file, 2000)
+            with open(input_file, mode="rb") as file:
+                data_start = len(file.readline())
+
+            for start, end in lebanon_extract_groups.find_chunk_boundaries(input_file, data_start, 4096):
+                with open(input_file, mode="rb") as file:
+                    file.seek(start)
+                    text = file.read(end - start)
+                self.assertEqual(text.count(b'"') % 2, 0)
+
+    def test_chunked_output_matches_sequential_reader(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers), tempfile.TemporaryDirectory() as directory:
+                input_file = os.path.join(directory, "groups.csv")
+                write_groups_csv(input_file, 2000)
+                with mock.patch.object(lebanon_extract_groups, "CHUNK_SIZE", 4096):
+                    lebanon_extract_groups.extract_groups_by_naming_convention(input_file, directory, workers=workers)
+
+                output_files = sorted(name for name in os.listdir(directory) if name.startswith("filtered_groups_"))
+                matched_file = next(name for name in output_files if not name.endswith(("_counts.csv", "_rejected.csv")))
+                rejected_file = next(name for name in output_files if name.endswith("_rejected.csv"))
+                expected_matched, expected_rejected = sequential_classification(input_file)
+                self.assertEqual(read_rows(os.path.join(directory, matched_file)), expected_matched)
+                self.assertEqual(read_rows(os.path.join(directory, rejected_file)), expected_rejected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import io
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import replace_vars_custom
+
+def render(text, variables, chunk_size):
+    output = io.StringIO()
+    segments = replace_vars_custom.iter_template_segments(io.StringIO(text), chunk_size=chunk_size)
+    replace_vars_custom.render_segments(segments, variables, output)
+    return output.getvalue()
+
+def render_whole(text, variables):
+    return replace_vars_custom.PLACEHOLDER_PATTERN.sub(lambda match: variables.get(match.group(1), match.group(0)), text)
+
+class StreamingTemplateTest(unittest.TestCase):
+    def test_unmatched_brace_does_not_hold_back_the_rest_of_the_file(self):
+        text = "intro { stray brace\n" + "line with {{ name }} in it\n" * 2000
+        chunk_size = 64
+        segments = list(replace_vars_custom.iter_template_segments(io.StringIO(text), chunk_size=chunk_size))
+
+        longest = max(len(segment) for segment in segments if isinstance(segment, str))
+        self.assertLessEqual(longest, chunk_size + replace_vars_custom.MAX_PLACEHOLDER_LENGTH)
+        self.assertEqual(render(text, {"name": "value"}, chunk_size), render_whole(text, {"name": "value"}))
+
+    def test_chunked_output_matches_whole_file(self):
+        rnd = random.Random(0)
+        pieces = ["{", "}", "{{", "}}", "{{ name }}", "{{other}}", "{{{name}}}", " ", "text", "\n",
+                  "{{" + "x" * 300 + "}}"]
+        variables = {"name": "value", "other": "{{name}}"}
+        for _ in range(200):
+            text = "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 60)))
+            for chunk_size in (1, 2, 3, 7, 64):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    self.assertEqual(render(text, variables, chunk_size), render_whole(text, variables))
+
+if __name__ == "__main__":
+    unittest.main()